@@ -9,6 +9,7 @@ from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from app import cache
 from app.database import AsyncSessionLocal
 from app.models import User
 
@@ -20,6 +21,8 @@ pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecretlocalkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+# token -> user lookups are served from the shared cache for this long; role changes apply after it
+PRINCIPAL_CACHE_TTL_S = float(os.getenv("PRINCIPAL_CACHE_TTL_S", "60"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
@@ -96,6 +99,21 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 # Current user dependencies
 # -------------------------
 
+async def load_principal(session: AsyncSession, username: str):
+    """
+    User row for an authenticated username, via the shared cache. Cached
+    users are detached copies; they are only read by the routes.
+    """
+    data = cache.get("principal", username) if PRINCIPAL_CACHE_TTL_S > 0 else None
+    if data is not None:
+        return User(**data)
+    res = await session.execute(select(User).where(User.username == username))
+    user = res.scalar_one_or_none()
+    if user and PRINCIPAL_CACHE_TTL_S > 0:
+        cache.put("principal", username, user.model_dump(exclude={"hashed_password"}), ttl=PRINCIPAL_CACHE_TTL_S)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: AsyncSession = Depends(get_session)
@@ -114,9 +132,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    q = select(User).where(User.username == username)
-    res = await session.execute(q)
-    user = res.scalar_one_or_none()
+    user = await load_principal(session, username)
 
     if not user:
         raise credentials_exception
@@ -127,4 +143,32 @@ async def get_current_user(
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ):
-    return current_user
\ No newline at end of file
+    return current_user
+
+def is_admin(user: User) -> bool:
+    # only the is_admin column grants admin; role is self-declared at sign-up
+    return bool(user.is_admin)
+
+
+async def get_current_admin_user(
+    current_user: User = Depends(get_current_user)
+):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
+
+async def user_from_token(token: str):
+    """
+    Resolve a bearer token outside FastAPI's dependency system (middleware).
+    Returns None instead of raising.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if not username:
+        return None
+    async with AsyncSessionLocal() as s:
+        return await load_principal(s, username)
@@ -0,0 +1,187 @@
+# app/cache.py
+"""
+Small key/value cache shared by the request paths that repeat work:
+PDF text, LLM responses and authenticated principals.
+
+CACHE_BACKEND=memory (default) keeps entries in the process, so every
+worker has its own copy. CACHE_BACKEND=sqlite keeps them in one SQLite file
+(CACHE_PATH) that all workers on the box read and write, so a PDF parsed or
+a prompt answered by one worker is a hit for the others. Point CACHE_PATH
+at /dev/shm to keep that file in shared memory.
+
+Values must be JSON-serialisable. Cache failures are never fatal: a broken
+backend behaves like a miss.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.metrics import counter
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | sqlite | off
+CACHE_PATH = os.getenv("CACHE_PATH", "./storage/cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+
+hits_total = counter("cache_hits_total", "Shared cache hits by namespace")
+misses_total = counter("cache_misses_total", "Shared cache misses by namespace")
+
+log = logging.getLogger("lc.cache")
+
+_MISS = object()
+
+
+class MemoryCache:
+    """
+    Per-process LRU with expiry. Values are stored serialised, like the
+    SQLite backend, so callers always get their own copy.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                return _MISS
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._data[(namespace, key)]
+                return _MISS
+            self._data.move_to_end((namespace, key))
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[(namespace, key)] = (json.dumps(value), time.time() + ttl if ttl else None)
+            self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+
+class SQLiteCache:
+    """
+    File-backed cache shared across worker processes. One connection per
+    thread; WAL lets readers in other workers proceed during a write.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL, accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # connections are per thread and per process (never inherited across fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Any:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return _MISS
+        value, expires_at = row
+        if expires_at and expires_at < time.time():
+            self.delete(namespace, key)
+            return _MISS
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now + ttl if ttl else None, now),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn, now)
+
+    def delete(self, namespace: str, key: str):
+        self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        # expired entries, then the oldest-written ones beyond max_entries
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE rowid IN ("
+            " SELECT rowid FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class NullCache:
+
+    def get(self, namespace: str, key: str) -> Any:
+        return _MISS
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    def delete(self, namespace: str, key: str):
+        pass
+
+
+def _build_backend():
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache()
+    if CACHE_BACKEND == "off":
+        return NullCache()
+    return MemoryCache()
+
+
+backend = _build_backend()
+
+
+def get(namespace: str, key: str, default: Any = None) -> Any:
+    try:
+        value = backend.get(namespace, key)
+    except Exception as e:
+        log.warning("cache get failed: %s", e)
+        value = _MISS
+    if value is _MISS:
+        misses_total.inc(namespace=namespace)
+        return default
+    hits_total.inc(namespace=namespace)
+    return value
+
+
+def put(namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+    try:
+        backend.set(namespace, key, value, ttl)
+    except Exception as e:
+        log.warning("cache set failed: %s", e)
+
+
+def delete(namespace: str, key: str):
+    try:
+        backend.delete(namespace, key)
+    except Exception as e:
+        log.warning("cache delete failed: %s", e)
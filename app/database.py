@@ -1,13 +1,102 @@
 from sqlmodel import SQLModel
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 import os
 
+from app.metrics import instrument_engine
+from app.migrations import run_migrations
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./lc_app_async.db")
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+# "sqlite" | "postgres" | "none"; inferred from DATABASE_URL when unset
+DB_PROFILE = os.getenv("DB_PROFILE")
+
+# -------------------------
+# SQLite profile
+# -------------------------
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+}
+
+# -------------------------
+# Postgres profile
+# -------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def normalize_url(url: str) -> str:
+    """
+    Map plain postgres URLs onto the asyncpg driver so a DATABASE_URL copied
+    from a hosting dashboard works as-is.
+    """
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def resolve_profile(url: str, profile: str = None) -> str:
+    if profile:
+        return profile
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return "sqlite"
+    if backend == "postgresql":
+        return "postgres"
+    return "none"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def build_engine(url: str = DATABASE_URL, profile: str = None, **overrides):
+    """
+    Create the async engine for the given URL using the matching profile.
+    "none" gives the untuned engine (kept for benchmarks and odd backends).
+    """
+    url = normalize_url(url)
+    profile = resolve_profile(url, profile)
+    kwargs = {"echo": False, "future": True}
+
+    if profile == "sqlite":
+        kwargs["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if make_url(url).database not in (None, "", ":memory:"):
+            kwargs["pool_size"] = DB_POOL_SIZE
+            kwargs["max_overflow"] = DB_MAX_OVERFLOW
+    elif profile == "postgres":
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    kwargs.update(overrides)
+    eng = create_async_engine(url, **kwargs)
+    if profile == "sqlite":
+        event.listen(eng.sync_engine, "connect", _set_sqlite_pragmas)
+    return eng
+
+
+engine = build_engine(DATABASE_URL, DB_PROFILE)
+instrument_engine(engine)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await run_migrations(conn)
@@ -0,0 +1,100 @@
+# app/file_serving.py
+"""
+Conditional and ranged file responses for the download endpoints.
+
+Full responses go through FileResponse (sendfile where the server supports
+it, otherwise chunked reads); a single byte range is streamed in fixed-size
+chunks, so memory stays constant whatever the file size. The ETag is the
+file's sha256, so it survives restarts and is shared between workers.
+"""
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.utils import etag_matches
+
+RANGE_CHUNK = 64 * 1024
+CACHE_CONTROL = "private, no-cache"
+_BYTE_RANGE = re.compile(r"([0-9]*)-([0-9]*)")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def content_etag(content_hash: str) -> str:
+    return f'"{content_hash}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single "bytes=" range. Returns None when
+    the header should be ignored: other units, several ranges or an
+    invalid spec such as "bytes=5-3" (RFC 9110 14.2: send the full file).
+    Raises RangeNotSatisfiable for a valid range that starts past the end
+    of the file or an empty suffix.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec or size == 0:
+        return None
+    m = _BYTE_RANGE.fullmatch(spec.strip())
+    if not m or not any(m.groups()):
+        return None
+    start_s, end_s = m.groups()
+    if not start_s:
+        # suffix range: the last N bytes
+        length = int(end_s)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(start_s)
+    if end_s and start > int(end_s):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(end_s), size - 1) if end_s else size - 1
+
+
+async def _read_range(path: str, start: int, end: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request: Request, path: str, content_hash: str, filename: str,
+               media_type: str = "application/pdf", inline: bool = True) -> Response:
+    etag = content_etag(content_hash)
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # a stale If-Range means the client's partial copy is outdated: send the whole file
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            })
+            return StreamingResponse(_read_range(path, start, end), status_code=206,
+                                     media_type=media_type, headers=headers)
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers,
+                        content_disposition_type="inline" if inline else "attachment")
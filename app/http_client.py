@@ -0,0 +1,184 @@
+# app/http_client.py
+"""
+Process-wide HTTP clients for outbound LLM traffic.
+
+One async client (used by litellm.acompletion and the chat stream) and one
+sync client (used by the CrewAI agents, which call litellm synchronously
+from worker threads) share keep-alive connection pools, so calls to the
+provider reuse warm TCP/TLS connections instead of handshaking per call.
+HTTP/2 is used when the h2 package is installed (httpx[http2]).
+
+Both are opened in the app startup hook and closed on shutdown, and are
+created lazily if something (e.g. the warm-up thread) needs them earlier.
+Every request is traced so /metrics shows how many requests went out and
+how many new connections they needed; stats() gives the same as a dict.
+"""
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+import httpx
+
+from app.metrics import counter
+
+# verification stays off by default, as the previous global httpx patch did (corporate TLS proxy);
+# set HTTP_VERIFY_SSL=1, optionally with HTTP_CA_BUNDLE, to verify
+HTTP_VERIFY_SSL = os.getenv("HTTP_VERIFY_SSL", "0") == "1"
+HTTP_CA_BUNDLE = os.getenv("HTTP_CA_BUNDLE") or None
+HTTP2 = os.getenv("HTTP2", "1") == "1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))
+
+requests_total = counter("http_client_requests_total", "Outbound HTTP requests by client and protocol")
+connections_total = counter("http_client_connections_total", "New outbound TCP connections by client")
+tls_total = counter("http_client_tls_handshakes_total", "TLS handshakes on outbound connections")
+
+_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+
+
+def _http2_available() -> bool:
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _verify():
+    if not HTTP_VERIFY_SSL:
+        return False
+    return HTTP_CA_BUNDLE or True
+
+
+def _settings() -> dict:
+    return {
+        "verify": _verify(),
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+    }
+
+
+def _on_trace(client: str, event: str):
+    # httpcore trace events; a request on a pooled connection emits neither
+    if event == "connection.connect_tcp.complete":
+        connections_total.inc(client=client)
+    elif event == "connection.start_tls.complete":
+        tls_total.inc(client=client)
+
+
+def _on_response(client: str, response: httpx.Response):
+    requests_total.inc(client=client, http_version=response.http_version)
+
+
+# -------------------------
+# Async client
+# -------------------------
+
+async def _async_trace(event: str, info: dict):
+    _on_trace("async", event)
+
+
+async def _async_request_hook(request: httpx.Request):
+    request.extensions["trace"] = _async_trace
+
+
+async def _async_response_hook(response: httpx.Response):
+    _on_response("async", response)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(
+                event_hooks={"request": [_async_request_hook], "response": [_async_response_hook]},
+                **_settings(),
+            )
+        return _async_client
+
+
+# -------------------------
+# Sync client
+# -------------------------
+
+def _sync_trace(event: str, info: dict):
+    _on_trace("sync", event)
+
+
+def _sync_request_hook(request: httpx.Request):
+    request.extensions["trace"] = _sync_trace
+
+
+def _sync_response_hook(response: httpx.Response):
+    _on_response("sync", response)
+
+
+def get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                event_hooks={"request": [_sync_request_hook], "response": [_sync_response_hook]},
+                **_settings(),
+            )
+        return _sync_client
+
+
+# -------------------------
+# Lifespan
+# -------------------------
+
+async def open_clients():
+    async_client, sync_client = get_async_client(), get_sync_client()
+    litellm = sys.modules.get("litellm")
+    if litellm is not None:
+        # already imported (preloaded in the master, or warmed): point it at this process's clients
+        litellm.aclient_session, litellm.client_session = async_client, sync_client
+
+
+def reset_after_fork():
+    """
+    Drop clients inherited from a preloading parent; the worker opens its own.
+    """
+    global _async_client, _sync_client
+    _async_client = _sync_client = None
+
+
+async def close_clients():
+    global _async_client, _sync_client
+    with _lock:
+        async_client, sync_client = _async_client, _sync_client
+        _async_client = _sync_client = None
+    if async_client is not None:
+        await async_client.aclose()
+    if sync_client is not None:
+        sync_client.close()
+
+
+def stats() -> Dict[str, dict]:
+    out = {}
+    for client in ("async", "sync"):
+        requests = sum(v for k, v in requests_total._values.items() if ("client", client) in k)
+        connections = connections_total.value(client=client)
+        out[client] = {
+            "requests": int(requests),
+            "new_connections": int(connections),
+            "tls_handshakes": int(tls_total.value(client=client)),
+            "reuse_ratio": round(1 - connections / requests, 3) if requests else None,
+        }
+    out["http2"] = _http2_available()
+    return out
@@ -1,27 +1,70 @@
 # app/main.py
 import os
-from fastapi import FastAPI
+import json
+import time
+import asyncio
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app import http_client, warmup
 from app.database import init_db
-from app.routers import auth_router, files_router, lc_router, ucp_router, agents_router
-import httpx
+from app.metrics import http_duration, render_prometheus, request_spans
+from app.profiling import profile_middleware
+from app.services.llm_gateway import LLM_CB_COOLDOWN_S, LLMUnavailableError
+from app.routers import auth_router, files_router, lc_router, ucp_router, agents_router, batch_router, admin_router, validations_router
 
-# Patch all httpx calls to ignore SSL
-_original_client = httpx.Client
-_original_async_client = httpx.AsyncClient
+app = FastAPI(title="LC Agentic API (Local)")
 
-def patched_client(*args, **kwargs):
-    kwargs["verify"] = False
-    return _original_client(*args, **kwargs)
+# one JSON line per request with its stage breakdown
+REQUEST_TIMING_LOG = os.getenv("REQUEST_TIMING_LOG", "0") == "1"
+timing_log = logging.getLogger("lc.timing")
+if REQUEST_TIMING_LOG and not timing_log.handlers:
+    timing_log.addHandler(logging.StreamHandler())
+    timing_log.setLevel(logging.INFO)
 
-def patched_async_client(*args, **kwargs):
-    kwargs["verify"] = False
-    return _original_async_client(*args, **kwargs)
 
-httpx.Client = patched_client
-httpx.AsyncClient = patched_async_client
+app.middleware("http")(profile_middleware)
 
-app = FastAPI(title="LC Agentic API (Local)")
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    spans = []
+    token = request_spans.set(spans)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        request_spans.reset(token)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        http_duration.observe(elapsed, method=request.method, route=path, status=status_code)
+        if REQUEST_TIMING_LOG:
+            stages = {}
+            for stage, seconds in spans:
+                stages[stage] = round(stages.get(stage, 0) + seconds * 1000, 2)
+            timing_log.info(json.dumps({
+                "method": request.method,
+                "route": path,
+                "status": status_code,
+                "ms": round(elapsed * 1000, 2),
+                "stages_ms": stages,
+            }))
+
+
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable(request: Request, exc: LLMUnavailableError):
+    # provider is down or rate limiting us past the retry budget; tell clients when to come back
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(int(LLM_CB_COOLDOWN_S))})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,13 +79,12 @@ app.include_router(files_router.router)
 app.include_router(lc_router.router)
 app.include_router(ucp_router.router)
 app.include_router(agents_router.router)
+app.include_router(batch_router.router)
+app.include_router(admin_router.router)
+app.include_router(validations_router.router)
 
 @app.on_event("startup")
 async def on_startup():
-    # SSL bypass for litellm as in your streamlit
-    import httpx, litellm
-    httpx_client = httpx.Client(verify=False)
-    litellm.client_session = httpx_client
     os.environ.setdefault("OTEL_SDK_DISABLED", "true")
     # init db
     await init_db()
@@ -50,3 +92,32 @@ async def on_startup():
     os.makedirs(os.getenv("STORAGE_BASE", "./storage"), exist_ok=True)
     os.makedirs("./storage/lc", exist_ok=True)
     os.makedirs("./storage/ucp", exist_ok=True)
+    # one pooled HTTP client pair for all LLM traffic, opened before anything can call out
+    await http_client.open_clients()
+    # heavy dependencies (crewai, litellm, langchain, embeddings) load lazily
+    if warmup.WARMUP == "blocking":
+        await asyncio.to_thread(warmup.warm_all)
+    elif warmup.WARMUP == "background":
+        warmup.start_background_warmup()
+    app.state.started = True
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready(require: str | None = None):
+    """
+    Readiness probe. Always lists which subsystems are warm; with
+    ?require=llm,crewai it answers 503 until those are warm.
+    """
+    subsystems = warmup.status()
+    needed = [n for n in (require or "").split(",") if n]
+    ok = getattr(app.state, "started", False) and all(warmup.is_warm(n) for n in needed)
+    body = {"ready": ok, "subsystems": subsystems}
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    from app.services.batch_scheduler import scheduler
+    from app.services.prefetch import prefetcher
+    await scheduler.shutdown()
+    await prefetcher.shutdown()
+    await http_client.close_clients()
@@ -0,0 +1,255 @@
+# app/metrics.py
+"""
+Minimal in-process metrics: labelled counters, gauges and histograms, timing spans
+and Prometheus text exposition (served on /metrics).
+
+Spans also append to a per-request list held in a context variable, which
+the timing middleware uses for the optional structured request log.
+Context variables are copied into asyncio.to_thread workers, so stages run
+in threads are attributed to the request that started them.
+"""
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+
+class Gauge:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+
+REGISTRY: Dict[str, object] = {}
+
+
+def counter(name: str, help: str) -> Counter:
+    if name not in REGISTRY:
+        REGISTRY[name] = Counter(name, help)
+    return REGISTRY[name]
+
+
+def gauge(name: str, help: str) -> Gauge:
+    if name not in REGISTRY:
+        REGISTRY[name] = Gauge(name, help)
+    return REGISTRY[name]
+
+
+def histogram(name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    if name not in REGISTRY:
+        REGISTRY[name] = Histogram(name, help, buckets)
+    return REGISTRY[name]
+
+
+# -------------------------
+# Spans
+# -------------------------
+
+stage_duration = histogram("stage_duration_seconds", "Duration of pipeline stages")
+stage_errors = counter("stage_errors_total", "Pipeline stages that raised")
+
+# (stage, seconds) pairs for the request being served, if any
+request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_duration.observe(elapsed, stage=stage, **labels)
+        spans = request_spans.get()
+        if spans is not None:
+            spans.append((":".join([stage, *map(str, labels.values())]), elapsed))
+
+
+def timed(stage: str, **labels):
+    """
+    Decorator form of span() for sync and async functions.
+    """
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_inner(*args, **kwargs):
+                with span(stage, **labels):
+                    return await fn(*args, **kwargs)
+            return async_inner
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(stage, **labels):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# -------------------------
+# Database queries
+# -------------------------
+
+db_query_duration = histogram("db_query_duration_seconds", "Database statement execution time")
+
+
+def instrument_engine(async_engine):
+    from sqlalchemy import event
+
+    sync_engine = async_engine.sync_engine
+
+    # one slot per connection, tagged with the cursor: statements on a connection run
+    # one at a time, and one that raises is simply overwritten by the next
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = (id(cursor), time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        cursor_id, started = conn.info.pop("query_start", (None, None))
+        if cursor_id != id(cursor):
+            return
+        elapsed = time.perf_counter() - started
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(elapsed, statement=verb)
+        spans = request_spans.get()
+        if spans is not None:
+            spans.append((f"db.{verb.lower()}", elapsed))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop("query_start", None)
+
+
+# -------------------------
+# LLM usage
+# -------------------------
+
+llm_calls = counter("llm_calls_total", "Completed LLM calls")
+llm_tokens = counter("llm_tokens_total", "LLM tokens used")
+llm_latency = histogram("llm_call_duration_seconds", "LLM call latency as seen by litellm")
+
+
+def record_llm_usage(kwargs, completion_response, start_time, end_time):
+    """
+    litellm success callback: count calls, tokens and latency per model.
+    """
+    model = kwargs.get("model", "unknown")
+    llm_calls.inc(model=model)
+    try:
+        llm_latency.observe((end_time - start_time).total_seconds(), model=model)
+    except Exception:
+        pass
+    usage = getattr(completion_response, "usage", None)
+    if usage is None and isinstance(completion_response, dict):
+        usage = completion_response.get("usage")
+    if not usage:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k, d=0: getattr(usage, k, d)
+    llm_tokens.inc(get("prompt_tokens", 0) or 0, model=model, type="prompt")
+    llm_tokens.inc(get("completion_tokens", 0) or 0, model=model, type="completion")
+
+
+# -------------------------
+# HTTP requests
+# -------------------------
+
+http_duration = histogram("http_request_duration_seconds", "HTTP request latency")
+
+
+# -------------------------
+# Prometheus exposition
+# -------------------------
+
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY.values():
+        if isinstance(metric, (Counter, Gauge)):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {'counter' if isinstance(metric, Counter) else 'gauge'}")
+            for key, value in list(metric._values.items()):
+                lines.append(f"{metric.name}{_fmt_labels(key)} {value}")
+        elif isinstance(metric, Histogram):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} histogram")
+            for key, row in list(metric._values.items()):
+                for bound, count in zip(metric.buckets, row):
+                    lines.append(f"{metric.name}_bucket{_fmt_labels(key, (('le', str(bound)),))} {count}")
+                lines.append(f"{metric.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {row[-1]}")
+                lines.append(f"{metric.name}_sum{_fmt_labels(key)} {row[-2]}")
+                lines.append(f"{metric.name}_count{_fmt_labels(key)} {row[-1]}")
+    return "\n".join(lines) + "\n"
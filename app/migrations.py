@@ -0,0 +1,158 @@
+# app/migrations.py
+"""
+Versioned schema migrations.
+
+`create_all` only creates missing tables, so columns and indexes added to
+existing tables never reach a live database. Each entry in MIGRATIONS is
+applied once, in order, and recorded in the `schema_version` table. Steps
+are idempotent so a fresh database (where create_all already built the
+final schema) simply records the versions.
+"""
+from datetime import datetime
+from typing import Dict, Union
+
+from sqlalchemy import inspect, text
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+# arbitrary key so concurrent workers on postgres do not race each other
+_PG_LOCK_KEY = 7_026_027
+
+
+# -------------------------
+# Step builders
+# -------------------------
+
+def create_index(name: str, table: str, *columns: str, unique: bool = False):
+    def step(conn):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return step
+
+
+def add_column(table: str, column: str, ddl: Union[str, Dict[str, str]]):
+    """
+    ddl is the column type plus constraints, e.g. "INTEGER NOT NULL DEFAULT 0",
+    or a {dialect: ddl} dict when the type differs ("sqlite", "postgresql").
+    """
+    def step(conn):
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column not in existing:
+            column_ddl = ddl[conn.dialect.name] if isinstance(ddl, dict) else ddl
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_ddl}"))
+    return step
+
+
+def backfill_validations(batch_size: int = 500):
+    """
+    Move legacy ValidationResult rows (Python repr stored twice in summary
+    and raw) to the compressed payload plus extracted columns.
+    """
+    def step(conn):
+        from app.services.lc_pipeline import parse_legacy_result, validation_columns
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, summary, raw FROM validationresult"
+                     " WHERE payload IS NULL AND id > :last ORDER BY id LIMIT :n"),
+                {"last": last_id, "n": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            for row_id, summary, raw in rows:
+                result = parse_legacy_result(raw or summary or "")
+                if result:
+                    conn.execute(
+                        text("UPDATE validationresult SET overall_status = :overall_status,"
+                             " issue_count = :issue_count, payload = :payload, summary = :summary,"
+                             " raw = NULL WHERE id = :id"),
+                        {**validation_columns(result), "id": row_id},
+                    )
+                last_id = row_id
+    return step
+
+
+def prune_stage_results(conn):
+    """
+    Keep only the newest StageResult per (lc_id, stage, subject); extract_lc
+    rows were keyed by file hash and now share the "lc" subject.
+    """
+    conn.execute(text("UPDATE stageresult SET subject = 'lc' WHERE stage = 'extract_lc'"))
+    conn.execute(text(
+        "DELETE FROM stageresult WHERE id NOT IN ("
+        " SELECT MAX(id) FROM stageresult GROUP BY lc_id, stage, subject)"
+    ))
+
+
+# -------------------------
+# Migrations
+# -------------------------
+
+MIGRATIONS = [
+    (1, "index hot lookup columns", [
+        create_index("ix_attachment_lc_id", "attachment", "lc_id"),
+        create_index("ix_validationresult_lc_id", "validationresult", "lc_id"),
+        create_index("ix_ucpdocument_active", "ucpdocument", "active"),
+        create_index("ix_lc_created_at", "lc", "created_at"),
+    ]),
+    (2, "keyset pagination indexes", [
+        create_index("ix_lc_created_at_id", "lc", "created_at", "id"),
+        create_index("ix_lc_status", "lc", "status"),
+        create_index("ix_ucpdocument_uploaded_at_id", "ucpdocument", "uploaded_at", "id"),
+    ]),
+    (3, "lc version counter", [
+        add_column("lc", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ]),
+    (4, "attachment content hash", [
+        add_column("attachment", "content_hash", "VARCHAR(64)"),
+        create_index("ix_attachment_content_hash", "attachment", "content_hash"),
+    ]),
+    (5, "compact validation results", [
+        add_column("validationresult", "overall_status", "VARCHAR(32)"),
+        add_column("validationresult", "issue_count", "INTEGER"),
+        add_column("validationresult", "model", "VARCHAR(255)"),
+        add_column("validationresult", "payload", {"sqlite": "BLOB", "postgresql": "BYTEA"}),
+        create_index("ix_validationresult_overall_status", "validationresult", "overall_status"),
+        create_index("ix_validationresult_created_at", "validationresult", "created_at"),
+        create_index("ix_stageresult_created_at", "stageresult", "created_at"),
+        backfill_validations(),
+    ]),
+    (6, "ucp document content hash", [
+        add_column("ucpdocument", "content_hash", "VARCHAR(64)"),
+    ]),
+    (7, "one stage result per lc, stage and subject", [
+        prune_stage_results,
+        create_index("ix_stageresult_lc_id_stage_subject", "stageresult", "lc_id", "stage", "subject"),
+    ]),
+]
+
+
+def _apply(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _PG_LOCK_KEY})
+    conn.execute(text(SCHEMA_VERSION_DDL))
+    applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+    for version, description, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        for step in steps:
+            step(conn)
+        conn.execute(
+            text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+            {"v": version, "d": description, "t": datetime.utcnow()},
+        )
+
+
+async def run_migrations(conn):
+    await conn.run_sync(_apply)
+
+
+def current_version(conn) -> int:
+    row = conn.execute(text("SELECT MAX(version) FROM schema_version")).first()
+    return row[0] or 0
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Index, LargeBinary
 from typing import Optional, List
 from datetime import datetime
 
@@ -11,31 +12,129 @@ class User(SQLModel, table=True):
     is_admin: bool = Field(default=False)
 
 class LC(SQLModel, table=True):
+    __table_args__ = (Index("ix_lc_created_at_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     lc_no: str = Field(index=True)
     extracted_json: Optional[str] = None
-    status: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    status: Optional[str] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # bumped on every write to the LC or its children; drives the detail ETag
+    version: int = Field(default=1)
+
+    attachments: List["Attachment"] = Relationship(back_populates="lc")
+    validations: List["ValidationResult"] = Relationship(back_populates="lc")
+
+    def touch(self):
+        # incremented in SQL at flush, so concurrent writers never store the same version;
+        # the attribute is expired afterwards (refresh before reading it)
+        self.version = LC.version + 1
 
 class Attachment(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    lc_id: Optional[int] = Field(default=None, foreign_key="lc.id")
+    lc_id: Optional[int] = Field(default=None, foreign_key="lc.id", index=True)
     filename: str
     filepath: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    # sha256 of the file, set on upload (filled in lazily for older rows)
+    content_hash: Optional[str] = Field(default=None, index=True)
+
+    lc: Optional[LC] = Relationship(back_populates="attachments")
 
 class UCPDocument(SQLModel, table=True):
+    __table_args__ = (Index("ix_ucpdocument_uploaded_at_id", "uploaded_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
     filepath: str
-    active: bool = Field(default=False)
+    active: bool = Field(default=False, index=True)
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    # sha256 of the PDF, set on upload (filled in on first download for older rows)
+    content_hash: Optional[str] = None
 
 class ValidationResult(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    lc_id: int = Field(foreign_key="lc.id")
+    lc_id: int = Field(foreign_key="lc.id", index=True)
     valid: bool
-    summary: str
-    raw: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    summary: str  # recommendation, truncated; the full result is in payload
+    raw: Optional[str] = None  # legacy rows only: Python repr of the result
+    overall_status: Optional[str] = Field(default=None, index=True)
+    issue_count: Optional[int] = None
+    model: Optional[str] = None
+    # zlib-compressed JSON of the compliance result
+    payload: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+    lc: Optional[LC] = Relationship(back_populates="validations")
+    discrepancies: List["Discrepancy"] = Relationship(back_populates="validation")
+
+class Discrepancy(SQLModel, table=True):
+    """
+    One non-matching row of a discrepancy table, kept per validation so
+    field-level stats are a GROUP BY instead of a scan of every payload.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    validation_id: int = Field(foreign_key="validationresult.id", index=True)
+    lc_id: int = Field(foreign_key="lc.id", index=True)
+    field: str = Field(index=True)
+    status: str  # mismatch | missing | other
+    document: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+    validation: Optional[ValidationResult] = Relationship(back_populates="discrepancies")
+
+class StageResult(SQLModel, table=True):
+    """
+    Output of one pipeline stage, keyed by a fingerprint of its inputs so a
+    re-validation can reuse it when nothing it depends on has changed.
+    Only the latest result per (lc_id, stage, subject) is kept.
+    """
+    __table_args__ = (
+        Index("ix_stageresult_stage_fingerprint", "stage", "fingerprint"),
+        Index("ix_stageresult_lc_id_stage_subject", "lc_id", "stage", "subject"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    lc_id: int = Field(foreign_key="lc.id", index=True)
+    stage: str  # extract_lc | extract_document | discrepancy | compliance
+    subject: str  # supporting document content hash, or "lc" for LC-wide stages
+    fingerprint: str
+    model: Optional[str] = None
+    output: str  # JSON
+    duration_ms: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class LCBatch(SQLModel, table=True):
+    """
+    A bulk submission. Jobs run in the worker process that accepted the
+    upload, but progress lives here so any worker can report it.
+    """
+    id: str = Field(primary_key=True)
+    user: str = Field(index=True)
+    ucp_id: Optional[int] = None
+    total: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    finished_at: Optional[datetime] = None
+
+class LCBatchItem(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    batch_id: str = Field(foreign_key="lcbatch.id", index=True)
+    lc_id: int = Field(foreign_key="lc.id")
+    lc_no: str
+    status: str = Field(default="queued")  # queued | running | done | failed
+    stage: Optional[str] = None
+    overall_status: Optional[str] = None
+    error: Optional[str] = None
+    seconds: Optional[float] = None
+
+class ChatSessionRecord(SQLModel, table=True):
+    """
+    /agent/chat conversation state, shared by all workers.
+    """
+    id: str = Field(primary_key=True)
+    user: str = Field(index=True)
+    lc_id: Optional[int] = None
+    ucp_id: Optional[int] = None
+    history: str = "[]"  # JSON [[role, text], ...], already trimmed
+    last_used: datetime = Field(default_factory=datetime.utcnow, index=True)
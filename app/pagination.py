@@ -0,0 +1,79 @@
+# app/pagination.py
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Pages are ordered newest first on (timestamp, id) and the cursor is the key
+of the last row returned, so every page is a single index range scan no
+matter how deep the client pages. Rows are serialized and streamed to the
+client as they are read from the database.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+
+from app.database import AsyncSessionLocal
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(stmt, ts_col, id_col, cursor: Optional[str], limit: int):
+    """
+    Apply newest-first ordering, the cursor predicate and limit+1 (the extra
+    row only tells us whether another page exists).
+    """
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(ts_col < ts, and_(ts_col == ts, id_col < row_id)))
+    return stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_page(stmt, limit: int, serialize: Callable[[Any], dict], key: Callable[[Any], tuple]) -> StreamingResponse:
+    """
+    Stream {"items": [...], "next_cursor": ...} built from `stmt` (already
+    passed through keyset_page). The generator owns its session because the
+    request-scoped one may be closed before the body is sent.
+    """
+    async def body():
+        yield '{"items":['
+        next_cursor = None
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            count = 0
+            last = None
+            async for row in result:
+                if count == limit:
+                    next_cursor = encode_cursor(*key(last))
+                    break
+                yield ("," if count else "") + json.dumps(serialize(row), default=_json_default)
+                last = row
+                count += 1
+            await result.close()
+        yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+    return StreamingResponse(body(), media_type="application/json")
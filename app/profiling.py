@@ -0,0 +1,130 @@
+# app/profiling.py
+"""
+Opt-in, admin-only request profiling.
+
+Send `X-Profile: 1` (or `?profile=1`) with an admin bearer token and the
+request runs under pyinstrument's sampling profiler. The result is written
+as a speedscope file under storage/profiles/ and linked from the response
+headers (X-Profile-Id and Link: </admin/profiles/<id>>; rel="profile").
+
+Profiling is capped so it is safe under load: at most
+PROFILE_MAX_CONCURRENT profiled requests at a time, PROFILE_MAX_PER_MINUTE
+per minute, and a sampling interval no finer than PROFILE_MIN_INTERVAL_MS.
+Requests over the cap run normally with an X-Profile-Skipped header.
+Only the time until response headers are ready is covered, so streaming
+bodies are not included.
+"""
+import os
+import re
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi import Request
+
+from app.auth import is_admin, user_from_token
+
+PROFILE_DIR = os.path.join(os.getenv("STORAGE_BASE", "./storage"), "profiles")
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))
+PROFILE_MIN_INTERVAL_MS = float(os.getenv("PROFILE_MIN_INTERVAL_MS", "1"))
+PROFILE_DEFAULT_INTERVAL_MS = float(os.getenv("PROFILE_DEFAULT_INTERVAL_MS", "5"))
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.speedscope\.json$")
+
+
+class ProfileBudget:
+    """
+    Concurrency + sliding one-minute window cap on profiled requests.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_minute: int):
+        self.max_concurrent = max_concurrent
+        self.max_per_minute = max_per_minute
+        self._active = 0
+        self._started = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] > 60:
+                self._started.popleft()
+            if self._active >= self.max_concurrent or len(self._started) >= self.max_per_minute:
+                return False
+            self._active += 1
+            self._started.append(now)
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+
+budget = ProfileBudget(PROFILE_MAX_CONCURRENT, PROFILE_MAX_PER_MINUTE)
+
+
+def _requested(request: Request) -> bool:
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    return (flag or "").lower() in ("1", "true", "yes")
+
+
+def _interval_seconds(request: Request) -> float:
+    raw = request.headers.get("x-profile-interval-ms") or request.query_params.get("profile_interval_ms")
+    try:
+        ms = float(raw) if raw else PROFILE_DEFAULT_INTERVAL_MS
+    except ValueError:
+        ms = PROFILE_DEFAULT_INTERVAL_MS
+    return max(ms, PROFILE_MIN_INTERVAL_MS) / 1000
+
+
+async def _is_admin_request(request: Request) -> bool:
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return False
+    user = await user_from_token(auth[7:].strip())
+    return bool(user and is_admin(user))
+
+
+def profile_path(name: str) -> str:
+    return os.path.join(PROFILE_DIR, name)
+
+
+async def profile_middleware(request: Request, call_next):
+    if not _requested(request) or not await _is_admin_request(request):
+        return await call_next(request)
+
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+    except ImportError:
+        response = await call_next(request)
+        response.headers["X-Profile-Skipped"] = "profiler-unavailable"
+        return response
+
+    if not budget.try_acquire():
+        response = await call_next(request)
+        response.headers["X-Profile-Skipped"] = "rate-limited"
+        return response
+
+    try:
+        profiler = Profiler(interval=_interval_seconds(request), async_mode="enabled")
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+
+        slug = re.sub(r"[^\w]+", "_", request.url.path).strip("_") or "root"
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{request.method.lower()}-{slug}-{uuid4().hex[:8]}.speedscope.json"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(profile_path(name), "w") as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+    finally:
+        budget.release()
+
+    response.headers["X-Profile-Id"] = name
+    response.headers["Link"] = f'</admin/profiles/{name}>; rel="profile"'
+    return response
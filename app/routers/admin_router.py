@@ -0,0 +1,35 @@
+# app/routers/admin_router.py
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from app import http_client
+from app.auth import get_current_admin_user
+from app.profiling import PROFILE_DIR, PROFILE_NAME, profile_path
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/profiles")
+async def list_profiles(user=Depends(get_current_admin_user)):
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted((n for n in os.listdir(PROFILE_DIR) if PROFILE_NAME.match(n)), reverse=True)
+    return [{"id": n, "size": os.path.getsize(profile_path(n))} for n in names]
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, user=Depends(get_current_admin_user)):
+    """
+    Speedscope JSON; open it at https://www.speedscope.app/.
+    """
+    if not PROFILE_NAME.match(profile_id) or not os.path.exists(profile_path(profile_id)):
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(profile_path(profile_id), media_type="application/json", filename=profile_id)
+
+
+@router.get("/http")
+async def http_stats(user=Depends(get_current_admin_user)):
+    """
+    Outbound connection reuse for the shared LLM HTTP clients.
+    """
+    return http_client.stats()
@@ -1,46 +1,78 @@
 # app/routers/agents_router.py
 from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi.responses import StreamingResponse
 from app.auth import get_current_active_user, get_session
+from app.database import AsyncSessionLocal
+from app.metrics import histogram, span
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.agent_services import run_doc_extractor
+from app.services.agent_services import make_llm, LLM_MODEL, LLM_BASE_URL, GROQ_API_KEY
 from app.services.ucp_loader import load_ucp_db_from_dir
-import os, json
+from app.services.chat_context import ChatSession, store as context_store
+from app.services.llm_gateway import estimate_tokens, gateway, kickoff, priority
+from app.warmup import ensure
+import asyncio, os, json, time
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
-@router.post("/chat")
-async def chat_query(query: str = Form(...), lc_id: int | None = None, ucp_id: int | None = None, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+chat_ttft = histogram("chat_time_to_first_token_seconds", "Time from /agent/chat request to first streamed token")
+chat_duration = histogram("chat_stream_duration_seconds", "Total duration of streamed /agent/chat answers")
+
+
+def _search_ucp(ucp_id: int | None, query: str, k: int = 3) -> str:
+    if not ucp_id:
+        return ""
+    ucp_dir = os.path.join("storage", "ucp", str(ucp_id))
+    chroma_dir = os.path.join(ucp_dir, "chroma")
+    if not os.path.exists(chroma_dir):
+        return ""
+    try:
+        ucp_db = load_ucp_db_from_dir(chroma_dir)
+        with span("similarity_search", caller="chat"):
+            retrieved = ucp_db.similarity_search(query, k=k)
+        return "\n\n".join([doc.page_content for doc in retrieved])
+    except Exception as e:
+        return ""
+
+
+async def _load_lc_context(lc_id: int | None) -> str:
+    if not lc_id:
+        return ""
+    from sqlmodel import select
+    from app.models import LC
+    # own session: the streaming path outlives the request-scoped one
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(select(LC.extracted_json).where(LC.id == lc_id))
+        return res.scalar_one_or_none() or ""
+
+
+async def gather_context(query: str, lc_id: int | None, ucp_id: int | None) -> tuple[str, str]:
     """
-    Basic chat endpoint — uses UCP vector DB + LC extracted JSON + supporting docs to form prompt.
-    For now, will call CrewAI LLM directly to answer with context.
+    LC JSON and UCP retrieval are independent; run them side by side
+    (the vector search is blocking, so it goes to a thread).
     """
-    # fetch ucp context
-    ucp_context = ""
-    if ucp_id:
-        ucp_dir = os.path.join("storage", "ucp", str(ucp_id))
-        chroma_dir = os.path.join(ucp_dir, "chroma")
-        if os.path.exists(chroma_dir):
-            try:
-                ucp_db = load_ucp_db_from_dir(chroma_dir)
-                retrieved = ucp_db.similarity_search(query, k=3)
-                ucp_context = "\n\n".join([doc.page_content for doc in retrieved])
-            except Exception as e:
-                ucp_context = ""
-    # optional LC context
-    lc_context = ""
-    if lc_id:
-        from sqlmodel import select
-        from app.models import LC, Attachment
-        q = select(LC).where(LC.id == lc_id)
-        res = await session.execute(q)
-        lc = res.scalar_one_or_none()
-        if lc and lc.extracted_json:
-            lc_context = lc.extracted_json
-    # Compose prompt & call crewai agent
-    from crewai import Agent, Task, Crew, LLM
-    llm = LLM(model="groq/meta-llama/llama-guard-4-12b", api_key=os.getenv("GROQ_API_KEY"))
-    agent = Agent(role="QA Agent", goal="Answer user query using LC / UCP content", llm=llm, allow_delegation=False)
-    task_text = f"""
+    return await asyncio.gather(
+        _load_lc_context(lc_id),
+        asyncio.to_thread(_search_ucp, ucp_id, query),
+    )
+
+
+async def resolve_context(query: str, chat: ChatSession) -> tuple[str, str]:
+    """
+    Use the cached per-LC bundle when the chat is about an LC; plain
+    per-query retrieval otherwise.
+    """
+    if chat.lc_id:
+        bundle = await context_store.get_bundle(chat.lc_id, chat.ucp_id, _search_ucp)
+        if bundle:
+            lc_context = bundle.lc_summary
+            if bundle.discrepancy_highlights:
+                lc_context += "\n\nLatest validation:\n" + bundle.discrepancy_highlights
+            return lc_context, bundle.ucp_articles
+    return await gather_context(query, chat.lc_id, chat.ucp_id)
+
+
+def build_task_text(query: str, lc_context: str, ucp_context: str, history: str = "") -> str:
+    text = f"""
 User question:
 {query}
 
@@ -50,7 +82,108 @@ LC context:
 UCP context:
 {ucp_context}
 """
+    if history:
+        text += f"""
+Conversation so far:
+{history}
+"""
+    return text
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer(query: str, chat: ChatSession):
+    started = time.perf_counter()
+    # kick off retrieval before the first byte goes out
+    context_task = asyncio.create_task(resolve_context(query, chat))
+    yield _sse("start", {"session_id": chat.id, "lc_id": chat.lc_id, "ucp_id": chat.ucp_id})
+    answer = []
+    try:
+        lc_context, ucp_context = await context_task
+        litellm = await asyncio.to_thread(ensure, "llm")
+        prompt = build_task_text(query, lc_context, ucp_context, chat.compact_history())
+        stream = await gateway.acall(
+            lambda: litellm.acompletion(
+                model=LLM_MODEL,
+                api_key=GROQ_API_KEY,
+                api_base=LLM_BASE_URL,
+                messages=[
+                    {"role": "system", "content": "You are a QA agent. Answer the user query using LC / UCP content, in plain text."},
+                    {"role": "user", "content": prompt},
+                ],
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+            prompt=prompt,
+            prio="interactive",
+        )
+        first = True
+        total_tokens = None
+        async for chunk in stream:
+            # the final chunk carries the usage for the whole answer
+            usage = getattr(chunk, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                total_tokens = usage.total_tokens
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if not token:
+                continue
+            if first:
+                ttft = time.perf_counter() - started
+                chat_ttft.observe(ttft)
+                yield _sse("meta", {"ttft_ms": round(ttft * 1000, 1)})
+                first = False
+            answer.append(token)
+            yield _sse("token", token)
+        gateway.settle(estimate_tokens(prompt), total_tokens)
+        chat.add_turn(query, "".join(answer))
+        await context_store.save_session(chat)
+        yield _sse("done", {"session_id": chat.id})
+    except Exception as e:
+        context_task.cancel()
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        chat_duration.observe(time.perf_counter() - started)
+
+
+@router.post("/chat")
+async def chat_query(query: str = Form(...), lc_id: int | None = None, ucp_id: int | None = None, session_id: str | None = Form(None), stream: bool = False, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    Basic chat endpoint — uses UCP vector DB + LC extracted JSON + supporting docs to form prompt.
+    With stream=true the answer is sent as server-sent events (start, meta,
+    token..., done) as the model produces it; otherwise CrewAI answers in one go.
+    Pass the returned session_id on follow-up questions to reuse the cached
+    LC context and keep the conversation history.
+    """
+    if session_id:
+        chat = await context_store.get_session(session_id, user.username)
+        if not chat:
+            raise HTTPException(404, "Chat session not found")
+        # a session stays on the LC / UCP it was opened for
+        if (lc_id is not None and lc_id != chat.lc_id) or (ucp_id is not None and ucp_id != chat.ucp_id):
+            raise HTTPException(409, "lc_id / ucp_id do not match the chat session")
+    else:
+        chat = await context_store.open_session(user.username, lc_id, ucp_id)
+
+    if stream:
+        return StreamingResponse(
+            stream_answer(query, chat),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    lc_context, ucp_context = await resolve_context(query, chat)
+    # Compose prompt & call crewai agent
+    await asyncio.to_thread(ensure, "crewai")
+    from crewai import Agent, Task, Crew
+    llm = make_llm()
+    agent = Agent(role="QA Agent", goal="Answer user query using LC / UCP content", llm=llm, allow_delegation=False)
+    task_text = build_task_text(query, lc_context, ucp_context, chat.compact_history())
     task = Task(description=task_text, expected_output="Answer in plain text", agent=agent)
     crew = Crew(agents=[agent], tasks=[task])
-    res = crew.kickoff()
-    return {"answer": str(res)}
+    with priority("interactive"):
+        res = await asyncio.to_thread(kickoff, crew, task_text, False)
+    chat.add_turn(query, str(res))
+    await context_store.save_session(chat)
+    return {"answer": str(res), "session_id": chat.id}
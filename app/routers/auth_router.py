@@ -27,6 +27,8 @@ async def create_user(payload: UserCreate, session: AsyncSession = Depends(get_s
     existing = res.scalar_one_or_none()
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
+    if (payload.role or "").strip().lower() == "admin":
+        raise HTTPException(status_code=403, detail="Admin accounts cannot be self-registered")
     user = User(username=payload.username, hashed_password=get_password_hash(payload.password), full_name=payload.full_name or "",role=payload.role or "read", is_admin=False)
     session.add(user)
     await session.commit()
@@ -0,0 +1,119 @@
+# app/routers/batch_router.py
+import asyncio
+import os
+import zipfile
+from uuid import uuid4
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from app.auth import get_current_active_user, get_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import LC, Attachment
+from app.routers.files_router import LC_STORAGE
+from app.services.batch_scheduler import load_batch, recent_batches, scheduler
+from app.utils import copy_and_hash
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+MAX_BATCH_LCS = int(os.getenv("MAX_BATCH_LCS", "5000"))
+# zip bomb guards, checked against the archive directory before anything is extracted
+MAX_BATCH_ENTRIES = int(os.getenv("MAX_BATCH_ENTRIES", "50000"))
+MAX_BATCH_UNCOMPRESSED_MB = int(os.getenv("MAX_BATCH_UNCOMPRESSED_MB", "4096"))
+
+
+def group_archive(archive: zipfile.ZipFile) -> dict[str, list[zipfile.ZipInfo]]:
+    """
+    Expected layout: one top-level folder per LC number holding its PDFs,
+    e.g. LC123/lc_LC123.pdf, LC123/invoice.pdf. As everywhere else, the LC
+    itself is the PDF with "lc" in its name.
+    """
+    groups: dict[str, list[zipfile.ZipInfo]] = {}
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        parts = [p for p in info.filename.replace("\\", "/").split("/") if p]
+        if len(parts) < 2 or not parts[-1].lower().endswith(".pdf") or parts[-1].startswith("."):
+            continue
+        groups.setdefault(parts[0], []).append(info)
+    return groups
+
+
+def extract_entries(archive: zipfile.ZipFile, entries: list[tuple[zipfile.ZipInfo, str]]) -> list[str]:
+    """
+    Write each (entry, target path) to disk; returns their sha256s.
+    """
+    hashes = []
+    for info, path in entries:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with archive.open(info) as src, open(path, "wb") as dst:
+            hashes.append(copy_and_hash(src, dst))
+    return hashes
+
+
+@router.post("/lc")
+async def submit_lc_batch(
+    archive: UploadFile = File(...),
+    ucp_id: int | None = Form(None),
+    user=Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Create every LC in the zip, store its files and queue the full
+    extract -> discrepancy -> compliance pipeline for each.
+    """
+    try:
+        zf = await asyncio.to_thread(zipfile.ZipFile, archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(400, "Upload must be a zip archive")
+    try:
+        if len(zf.infolist()) > MAX_BATCH_ENTRIES:
+            raise HTTPException(400, f"At most {MAX_BATCH_ENTRIES} entries per archive")
+        groups = group_archive(zf)
+        if not groups:
+            raise HTTPException(400, "No <lc_no>/<file>.pdf entries found in archive")
+        if len(groups) > MAX_BATCH_LCS:
+            raise HTTPException(400, f"At most {MAX_BATCH_LCS} LCs per batch")
+        uncompressed = sum(info.file_size for infos in groups.values() for info in infos)
+        if uncompressed > MAX_BATCH_UNCOMPRESSED_MB * 1024 * 1024:
+            raise HTTPException(413, f"Archive expands to more than {MAX_BATCH_UNCOMPRESSED_MB} MB")
+
+        created, planned = [], []
+        for lc_no, entries in groups.items():
+            lc = LC(lc_no=lc_no, status="queued")
+            session.add(lc)
+            await session.flush()
+            lc_dir = os.path.join(LC_STORAGE, str(lc.id))
+            for info in entries:
+                name = os.path.basename(info.filename)
+                target_dir = lc_dir if "lc" in name.lower() else os.path.join(lc_dir, "supporting")
+                planned.append((lc.id, name, info, os.path.join(target_dir, f"{uuid4().hex}.pdf")))
+            created.append({"lc_no": lc_no, "lc_id": lc.id})
+
+        # decompression and hashing stay off the event loop
+        hashes = await asyncio.to_thread(extract_entries, zf, [(info, path) for _, _, info, path in planned])
+    finally:
+        zf.close()
+    for (lc_id, name, _, path), content_hash in zip(planned, hashes):
+        session.add(Attachment(lc_id=lc_id, filename=name, filepath=path, content_hash=content_hash))
+    await session.commit()
+
+    batch = await scheduler.submit(user.username, created, ucp_id)
+    return {**batch.progress(), "lcs": created}
+
+
+@router.get("/")
+async def scheduler_stats(user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    This worker's throughput / ETA and slot usage, plus progress of the
+    most recent batches (from the database, so it covers every worker).
+    """
+    return {
+        **scheduler.stats(),
+        "batches": await recent_batches(session),
+    }
+
+
+@router.get("/{batch_id}")
+async def batch_status(batch_id: str, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    batch = await load_batch(session, batch_id)
+    if not batch:
+        raise HTTPException(404, "Batch not found")
+    return batch
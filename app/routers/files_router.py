@@ -1,11 +1,16 @@
 # app/routers/files_router.py
 import os
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
 from app.auth import get_current_active_user, get_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import LC, Attachment
+from app.file_serving import serve_file
+from app.services.incremental import ensure_content_hash
+from app.services.chat_context import store as chat_context_store
+from app.services.prefetch import PREFETCH_ON_UPLOAD, prefetcher
+from app.utils import copy_and_hash
 from sqlmodel import select
-import shutil
 from uuid import uuid4
 
 router = APIRouter(prefix="/files", tags=["files"])
@@ -15,7 +20,11 @@ LC_STORAGE = os.path.join(STORAGE_BASE, "lc")
 os.makedirs(LC_STORAGE, exist_ok=True)
 
 @router.post("/lc/{lc_id}/upload_lc")
-async def upload_lc_file(lc_id: int, file: UploadFile = File(...), user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+async def upload_lc_file(lc_id: int, file: UploadFile = File(...), prefetch: bool = PREFETCH_ON_UPLOAD, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    With prefetch=true the LC is parsed and extracted in the background
+    right away, so a later /extract_lc returns the stored result.
+    """
     q = select(LC).where(LC.id == lc_id)
     res = await session.execute(q)
     lc = res.scalar_one_or_none()
@@ -27,21 +36,30 @@ async def upload_lc_file(lc_id: int, file: UploadFile = File(...), user=Depends(
     os.makedirs(lc_dir, exist_ok=True)
     path = os.path.join(lc_dir, fname)
     with open(path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    att = Attachment(lc_id=lc_id, filename=file.filename, filepath=path)
+        content_hash = copy_and_hash(file.file, f)
+    att = Attachment(lc_id=lc_id, filename=file.filename, filepath=path, content_hash=content_hash)
     session.add(att)
+    lc.touch()
+    session.add(lc)
     await session.commit()
     await session.refresh(att)
-    return {"attachment_id": att.id, "filename": att.filename}
+    chat_context_store.invalidate_lc(lc_id)
+    if prefetch:
+        prefetcher.schedule(lc_id, path, content_hash, att.filename, main_lc=True)
+    return {"attachment_id": att.id, "filename": att.filename, "prefetch": prefetch}
 
 @router.post("/lc/{lc_id}/upload_supporting")
-async def upload_supporting_files(lc_id: int, files: list[UploadFile] = File(...), user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+async def upload_supporting_files(lc_id: int, files: list[UploadFile] = File(...), prefetch: bool = PREFETCH_ON_UPLOAD, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    With prefetch=true each document is parsed and extracted in the
+    background; re-uploading a file name cancels the job for the old copy.
+    """
     q = select(LC).where(LC.id == lc_id)
     res = await session.execute(q)
     lc = res.scalar_one_or_none()
     if not lc:
         raise HTTPException(status_code=404, detail="LC not found")
-    saved = []
+    saved, stored = [], []
     lc_dir = os.path.join(LC_STORAGE, str(lc_id), "supporting")
     os.makedirs(lc_dir, exist_ok=True)
     for file in files:
@@ -49,9 +67,33 @@ async def upload_supporting_files(lc_id: int, files: list[UploadFile] = File(...
         fname = f"{uuid4().hex}{ext}"
         path = os.path.join(lc_dir, fname)
         with open(path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        att = Attachment(lc_id=lc_id, filename=file.filename, filepath=path)
+            content_hash = copy_and_hash(file.file, f)
+        att = Attachment(lc_id=lc_id, filename=file.filename, filepath=path, content_hash=content_hash)
         session.add(att)
         saved.append(file.filename)
+        stored.append((path, content_hash, file.filename))
+    lc.touch()
+    session.add(lc)
     await session.commit()
-    return {"saved": saved}
+    chat_context_store.invalidate_lc(lc_id)
+    if prefetch:
+        for path, content_hash, filename in stored:
+            prefetcher.schedule(lc_id, path, content_hash, filename, main_lc=False)
+    return {"saved": saved, "prefetch": prefetch}
+
+@router.get("/attachments/{attachment_id}")
+async def download_attachment(attachment_id: int, request: Request, download: bool = False, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    The stored file (LC or supporting PDF). Supports Range requests for
+    in-browser PDF viewers and If-None-Match against the content-hash ETag.
+    Served inline unless download=true.
+    """
+    att = await session.get(Attachment, attachment_id)
+    if not att:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if not await asyncio.to_thread(os.path.isfile, att.filepath):
+        raise HTTPException(status_code=404, detail="Attachment file missing from storage")
+    if not att.content_hash:
+        await ensure_content_hash(session, att)
+        await session.commit()
+    return serve_file(request, att.filepath, att.content_hash, att.filename, inline=not download)
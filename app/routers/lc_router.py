@@ -1,43 +1,23 @@
 # app/routers/lc_router.py
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Header, Response
 from app.auth import get_current_active_user, get_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from sqlalchemy.orm import joinedload, selectinload
 from app.models import LC, Attachment, ValidationResult, UCPDocument
 from app.schemas import LCCreate, LCRead
-from app.services.pdf_reader import read_pdf_text
-from app.services.agent_services import run_lc_extractor, run_doc_extractor, run_discrepancy_check, run_compliance_check
-import os, json
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, stream_page
+from app.services.incremental import (
+    StageRunner, discrepancy_tables, ensure_content_hash, extract_lc_file, extract_supporting, revalidate,
+)
+from app.services.lc_pipeline import record_validation, validation_view
+from app.services.prefetch import prefetcher
+from app.utils import etag_matches, file_sha256
+import asyncio, os, json
 
 router = APIRouter(prefix="/lc", tags=["lc"])
 
 
-def clean_ai_json(model_output: str):
-    """
-    Removes ```json fences and parses the cleaned string into a dict.
-    """
-    if not model_output:
-        return {}
-
-    # Remove markdown fences
-    cleaned = (
-        model_output.replace("```json", "")
-                    .replace("```", "")
-                    .strip()
-    )
-
-    # Attempt JSON parsing
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        # Return raw output so frontend knows something is wrong
-        return {
-            "error": "Failed to parse JSON",
-            "raw": cleaned,
-            "exception": str(e),
-        }
-
-
 @router.post("/", response_model=LCRead)
 async def create_lc(payload: LCCreate, session: AsyncSession = Depends(get_session), user=Depends(get_current_active_user)):
     lc = LC(lc_no=payload.lc_no, status="created")
@@ -47,28 +27,71 @@ async def create_lc(payload: LCCreate, session: AsyncSession = Depends(get_sessi
     return lc
 
 
-@router.get("/", response_model=list[LCRead])
-async def list_lcs(session: AsyncSession = Depends(get_session), user=Depends(get_current_active_user)):
-    q = select(LC).order_by(LC.created_at.desc())
-    res = await session.execute(q)
-    lcs = res.scalars().all()
-    return lcs
+@router.get("/")
+async def list_lcs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: str | None = None,
+    include_extracted: bool = False,
+    user=Depends(get_current_active_user)
+):
+    """
+    Newest-first page of LCs. Pass the returned next_cursor to get the next
+    page; extracted_json is left out unless include_extracted=true.
+    """
+    columns = [LC.id, LC.lc_no, LC.status, LC.created_at]
+    if include_extracted:
+        columns.append(LC.extracted_json)
+    q = select(*columns)
+    if status:
+        q = q.where(LC.status == status)
+    q = keyset_page(q, LC.created_at, LC.id, cursor, limit)
+    return stream_page(
+        q, limit,
+        serialize=lambda row: dict(row._mapping),
+        key=lambda row: (row.created_at, row.id),
+    )
+
+
+def lc_etag(lc_id: int, version: int) -> str:
+    return f'"lc-{lc_id}-v{version}"'
 
 
 @router.get("/{lc_id}")
-async def get_lc_detail(lc_id: int, session: AsyncSession = Depends(get_session), user=Depends(get_current_active_user)):
-    q = select(LC).where(LC.id == lc_id)
+async def get_lc_detail(
+    lc_id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_active_user)
+):
+    # the LC row carries the version, so an unchanged poll costs one query
+    if if_none_match:
+        res = await session.execute(select(LC.version).where(LC.id == lc_id))
+        version = res.scalar_one_or_none()
+        if version is None:
+            raise HTTPException(404, "LC not found")
+        etag = lc_etag(lc_id, version)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+    # attachments are a handful of small rows, so they are joined in; the
+    # validations (with their payloads) come in one extra IN query
+    q = (
+        select(LC)
+        .where(LC.id == lc_id)
+        .options(joinedload(LC.attachments), selectinload(LC.validations))
+    )
     res = await session.execute(q)
-    lc = res.scalar_one_or_none()
+    lc = res.unique().scalar_one_or_none()
     if not lc:
         raise HTTPException(404, "LC not found")
-    q2 = select(Attachment).where(Attachment.lc_id == lc_id)
-    res2 = await session.execute(q2)
-    attachments = res2.scalars().all()
-    q3 = select(ValidationResult).where(ValidationResult.lc_id == lc_id)
-    res3 = await session.execute(q3)
-    validations = res3.scalars().all()
-    return {"lc": lc, "attachments": attachments, "validations": validations}
+    response.headers["ETag"] = lc_etag(lc.id, lc.version)
+    return {
+        "lc": lc,
+        "attachments": lc.attachments,
+        "validations": [validation_view(v) for v in lc.validations],
+    }
 
 
 # @router.post("/{lc_id}/extract_lc")
@@ -103,13 +126,18 @@ async def get_lc_detail(lc_id: int, session: AsyncSession = Depends(get_session)
 async def extract_lc_endpoint(
     lc_id: int,
     file_path: str = Form(None),
+    force: bool = False,
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_active_user),
 ):
     """
     Extract structured LC data from the attached LC PDF.
     If file_path is not provided, it uses the first LC attachment.
+    A result already computed for the same file and model (e.g. by the
+    upload prefetch) is reused unless force=true.
     """
+    # reuse an upload prefetch still running for this LC instead of racing it
+    await prefetcher.drain(lc_id, "lc", cancel=force)
 
     q = select(LC).where(LC.id == lc_id)
     res = await session.execute(q)
@@ -127,25 +155,19 @@ async def extract_lc_endpoint(
             raise HTTPException(400, "No LC file attached. Upload a PDF first.")
 
         file_path = att.filepath
-    text = read_pdf_text(file_path)
-
-    raw_output = run_lc_extractor(text)
-    model_text = raw_output.get("raw_output", "")
-    cleaned = (
-        model_text.replace("```json", "")
-                  .replace("```", "")
-                  .strip()
-    )
-    try:
-        structured_data = json.loads(cleaned)
-    except Exception as e:
-        structured_data = {
-            "error": "Failed to parse LC JSON output",
-            "raw": cleaned,
-            "exception": str(e),
-        }
+        file_hash = await ensure_content_hash(session, att)
+    else:
+        try:
+            file_hash = await asyncio.to_thread(file_sha256, file_path)
+        except OSError:
+            raise HTTPException(400, "File not found")
+
+    # schema-validated; parse failures come back as {"error": ..., "raw": ...}
+    runner = StageRunner(session, lc.id, force=force)
+    structured_data = await extract_lc_file(runner, file_path, file_hash, previously_extracted=bool(lc.extracted_json))
     lc.extracted_json = json.dumps(structured_data)
     lc.status = "extracted"
+    lc.touch()
     session.add(lc)
     await session.commit()
     await session.refresh(lc)
@@ -174,39 +196,25 @@ async def extract_lc_endpoint(
 @router.post("/{lc_id}/extract_supporting")
 async def extract_supporting_docs(
     lc_id: int,
+    force: bool = False,
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_active_user)
 ):
+    """
+    Extract every supporting document. Documents already extracted (e.g.
+    by the upload prefetch) are reused unless force=true.
+    """
+    await prefetcher.drain(lc_id, cancel=force)
     q = select(Attachment).where(Attachment.lc_id == lc_id)
     res = await session.execute(q)
     attachments = res.scalars().all()
 
-    results = []
-
-    for att in attachments:
-
-        # Skip the main LC PDF
-        if "lc" in att.filename.lower() and att.filepath.endswith(".pdf"):
-            continue
-
-        text = read_pdf_text(att.filepath)
-
-        # Run supporting doc extractor
-        parsed_output = run_doc_extractor(text)
-
-        # Expecting:
-        # parsed_output = { "raw_output": "```json {..} ```" }
-        raw_str = parsed_output.get("raw_output", "")
-
-        # Clean & convert to structured dict
-        structured = clean_ai_json(raw_str)
-
-        results.append({
-            "file_name": att.filename,
-            "data": structured
-        })
+    # Run supporting doc extractor (schema-validated); prefetched or unchanged files are reused
+    runner = StageRunner(session, lc_id, force=force)
+    results = [doc for _, doc in await extract_supporting(session, runner, attachments)]
+    await session.commit()
 
-    return {"results": results}
+    return {"results": results, "stages": runner.report()}
 
 
 # @router.post("/{lc_id}/discrepancy")
@@ -238,9 +246,15 @@ async def extract_supporting_docs(
 @router.post("/{lc_id}/discrepancy")
 async def run_discrepancy(
     lc_id: int,
+    force: bool = False,
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_active_user)
 ):
+    """
+    Per-document discrepancy tables against the extracted LC. Unchanged
+    documents reuse their stored extraction and tables unless force=true.
+    """
+    await prefetcher.drain(lc_id, cancel=force)
     # Load LC record
     q = select(LC).where(LC.id == lc_id)
     res = await session.execute(q)
@@ -255,33 +269,12 @@ async def run_discrepancy(
     res2 = await session.execute(q2)
     attachments = res2.scalars().all()
 
-    doc_results = []
-
-    for att in attachments:
-        # Skip main LC PDF
-        if "lc" in att.filename.lower() and att.filepath.endswith(".pdf"):
-            continue
-
-        text = read_pdf_text(att.filepath)
-
-        # Extract supporting doc
-        parsed_output = run_doc_extractor(text)
-
-        # raw_output may contain ```json ... ```
-        raw_str = parsed_output.get("raw_output", "")
-
-        # Clean markdown → structured JSON
-        structured = clean_ai_json(raw_str)
-
-        doc_results.append({
-            "file_name": att.filename,
-            "data": structured
-        })
-
-    # Run discrepancy check USING CLEANED STRUCTURED DATA
-    tables = run_discrepancy_check(lc_data, doc_results)
+    # Extract supporting docs and run the discrepancy check per document, reusing unchanged stages
+    runner = StageRunner(session, lc_id, force=force)
+    tables = await discrepancy_tables(session, runner, lc_data, attachments)
+    await session.commit()
 
-    return {"discrepancy_tables": tables}
+    return {"discrepancy_tables": tables, "stages": runner.report()}
 
 
 # @router.post("/{lc_id}/compliance")
@@ -341,9 +334,17 @@ async def run_discrepancy(
 async def run_compliance(
     lc_id: int,
     ucp_id: int | None = None,
+    force: bool = False,
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_active_user)
 ):
+    """
+    Extract supporting documents, check discrepancies and run the UCP
+    compliance review. Stages whose inputs (file hash, LC JSON, UCP, model)
+    are unchanged since a previous run are reused; "stages" in the response
+    lists what was computed and what was skipped. force=true recomputes all.
+    """
+    await prefetcher.drain(lc_id, cancel=force)
     # Load LC record
     q = select(LC).where(LC.id == lc_id)
     res = await session.execute(q)
@@ -351,76 +352,18 @@ async def run_compliance(
     if not lc or not lc.extracted_json:
         raise HTTPException(400, "LC not extracted")
 
-    lc_data = json.loads(lc.extracted_json)
-
     # Collect supporting attachments
     q2 = select(Attachment).where(Attachment.lc_id == lc_id)
     res2 = await session.execute(q2)
     attachments = res2.scalars().all()
-    supporting_paths = [a.filepath for a in attachments]
-
-    # Determine UCP directory
-    ucp_dir = None
-    if ucp_id:
-        q3 = select(UCPDocument).where(UCPDocument.id == ucp_id)
-        res3 = await session.execute(q3)
-        ucp = res3.scalar_one_or_none()
-        if ucp:
-            ucp_dir = os.path.join("storage", "ucp", str(ucp.id))
-    else:
-        qact = select(UCPDocument).where(UCPDocument.active == True)
-        resact = await session.execute(qact)
-        ucp = resact.scalars().first()
-        if ucp:
-            ucp_dir = os.path.join("storage", "ucp", str(ucp.id))
-
-    # Extract supporting documents with markdown fix
-    doc_results = []
-    from app.services.agent_services import run_doc_extractor
-
-    for att in attachments:
-        # Skip the main LC
-        if "lc" in att.filename.lower() and att.filepath.endswith(".pdf"):
-            continue
-
-        text = read_pdf_text(att.filepath)
-        parsed = run_doc_extractor(text)
-
-        # NORMALIZE MARKDOWN → JSON
-        raw_output = parsed.get("raw_output", "")
-        structured = clean_ai_json(raw_output)
-
-        doc_results.append({
-            "file_name": att.filename,
-            "data": structured
-        })
-
-    # Run discrepancy & compliance
-    from app.services.agent_services import run_discrepancy_check, run_compliance_check
-    
-    tables = run_discrepancy_check(lc_data, doc_results)
-
-    compliance_result = run_compliance_check(
-        lc_data,
-        tables,
-        ucp_dir,
-        None,
-        supporting_paths
-    )
 
-    # Store validation result
-    vr = ValidationResult(
-        lc_id=lc.id,
-        valid=(compliance_result.get("overall_status", "").lower() == "accepted"),
-        summary=str(compliance_result),
-        raw=str(compliance_result)
-    )
-    session.add(vr)
+    # Extract -> discrepancy -> compliance, recomputing only what changed
+    compliance_result, tables, stages = await revalidate(session, lc, attachments, ucp_id, force=force)
 
-    lc.status = compliance_result.get("overall_status", lc.status)
-    session.add(lc)
+    # Store validation result (compressed payload + discrepancy rows for stats)
+    vr = record_validation(session, lc, compliance_result, tables)
 
     await session.commit()
     await session.refresh(vr)
 
-    return {"compliance_result": compliance_result}
+    return {"compliance_result": compliance_result, "stages": stages}
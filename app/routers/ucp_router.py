@@ -1,11 +1,14 @@
 # app/routers/ucp_router.py
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request
 from app.auth import get_current_active_user, get_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import UCPDocument
 from sqlmodel import select
-import os, shutil, uuid
+import asyncio, os, uuid
+from app.file_serving import serve_file
 from app.services.ucp_loader import build_ucp_vector_db
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, stream_page
+from app.utils import copy_and_hash, file_sha256
 
 router = APIRouter(prefix="/ucp", tags=["ucp"])
 UCP_BASE = os.getenv("UCP_BASE", "./storage/ucp")
@@ -19,7 +22,7 @@ async def upload_ucp(file: UploadFile = File(...), name: str = Form(...), descri
     os.makedirs(ucp_dir, exist_ok=True)
     pdf_path = os.path.join(ucp_dir, f"ucp{ext}")
     with open(pdf_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+        content_hash = copy_and_hash(file.file, f)
     # build chroma vector DB locally
     try:
         persist_dir = os.path.join(ucp_dir, "chroma")
@@ -27,18 +30,46 @@ async def upload_ucp(file: UploadFile = File(...), name: str = Form(...), descri
     except Exception as e:
         # allow upload even if vectorization fails
         print("UCP vectorization error:", e)
-    u = UCPDocument(name=name, description=description or "", filepath=pdf_path, active=False)
+    u = UCPDocument(name=name, description=description or "", filepath=pdf_path, active=False, content_hash=content_hash)
     session.add(u)
     await session.commit()
     await session.refresh(u)
     return {"ucp_id": u.id, "name": u.name}
 
 @router.get("/")
-async def list_ucp(session: AsyncSession = Depends(get_session), user=Depends(get_current_active_user)):
-    q = select(UCPDocument).order_by(UCPDocument.uploaded_at.desc())
-    res = await session.execute(q)
-    docs = res.scalars().all()
-    return docs
+async def list_ucp(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    active: bool | None = None,
+    user=Depends(get_current_active_user)
+):
+    q = select(UCPDocument)
+    if active is not None:
+        q = q.where(UCPDocument.active == active)
+    q = keyset_page(q, UCPDocument.uploaded_at, UCPDocument.id, cursor, limit)
+    return stream_page(
+        q, limit,
+        serialize=lambda row: row[0].model_dump(),
+        key=lambda row: (row[0].uploaded_at, row[0].id),
+    )
+
+@router.get("/{ucp_id}/file")
+async def download_ucp(ucp_id: int, request: Request, download: bool = False, user=Depends(get_current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    The uploaded UCP PDF, with Range and If-None-Match support.
+    """
+    doc = await session.get(UCPDocument, ucp_id)
+    if not doc:
+        raise HTTPException(404, "UCP not found")
+    if not await asyncio.to_thread(os.path.isfile, doc.filepath):
+        raise HTTPException(404, "UCP file missing from storage")
+    if not doc.content_hash:
+        # uploaded before hashes were stored: hash once and keep it
+        doc.content_hash = await asyncio.to_thread(file_sha256, doc.filepath)
+        session.add(doc)
+        await session.commit()
+    filename = f"{doc.name}{os.path.splitext(doc.filepath)[1]}"
+    return serve_file(request, doc.filepath, doc.content_hash, filename, inline=not download)
 
 @router.post("/{ucp_id}/activate")
 async def activate_ucp(ucp_id: int, active: bool = True, session: AsyncSession = Depends(get_session), user=Depends(get_current_active_user)):
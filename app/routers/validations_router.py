@@ -0,0 +1,116 @@
+# app/routers/validations_router.py
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from app.auth import get_current_active_user, get_session
+from app.models import Discrepancy, StageResult, ValidationResult
+
+router = APIRouter(prefix="/validations", tags=["validations"])
+
+STATS_DEFAULT_DAYS = 30
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # stored timestamps are naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@router.get("/stats")
+async def validation_stats(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    top: int = Query(10, ge=1, le=100),
+    user=Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Aggregates over [since, until) (default: the last 30 days), computed in
+    SQL: acceptance rate, status and model breakdown, the most frequent
+    discrepancy fields and latency of the pipeline stages that ran.
+    """
+    until = _utc_naive(until) if until else datetime.utcnow()
+    since = _utc_naive(since) if since else until - timedelta(days=STATS_DEFAULT_DAYS)
+    if since >= until:
+        raise HTTPException(400, "since must be before until")
+
+    vr_range = (ValidationResult.created_at >= since, ValidationResult.created_at < until)
+    count = func.count().label("count")
+
+    q = select(
+        func.count(),
+        func.sum(case((ValidationResult.valid == True, 1), else_=0)),
+        func.avg(ValidationResult.issue_count),
+    ).where(*vr_range)
+    total, accepted, avg_issues = (await session.execute(q)).one()
+    total, accepted = total or 0, accepted or 0
+
+    q = (
+        select(ValidationResult.overall_status, count)
+        .where(*vr_range)
+        .group_by(ValidationResult.overall_status)
+        .order_by(count.desc())
+    )
+    by_status = [{"overall_status": s, "count": c} for s, c in (await session.execute(q)).all()]
+
+    q = (
+        select(ValidationResult.model, count)
+        .where(*vr_range)
+        .group_by(ValidationResult.model)
+        .order_by(count.desc())
+    )
+    by_model = [{"model": m, "count": c} for m, c in (await session.execute(q)).all()]
+
+    q = (
+        select(
+            Discrepancy.field,
+            count,
+            func.sum(case((Discrepancy.status == "mismatch", 1), else_=0)),
+            func.sum(case((Discrepancy.status == "missing", 1), else_=0)),
+            func.count(func.distinct(Discrepancy.lc_id)),
+        )
+        .where(Discrepancy.created_at >= since, Discrepancy.created_at < until)
+        .group_by(Discrepancy.field)
+        .order_by(count.desc())
+        .limit(top)
+    )
+    top_fields = [
+        {"field": f, "count": c, "mismatch": mm or 0, "missing": ms or 0, "lcs": lcs}
+        for f, c, mm, ms, lcs in (await session.execute(q)).all()
+    ]
+
+    q = (
+        select(
+            StageResult.stage,
+            count,
+            func.avg(StageResult.duration_ms),
+            func.min(StageResult.duration_ms),
+            func.max(StageResult.duration_ms),
+        )
+        .where(StageResult.created_at >= since, StageResult.created_at < until)
+        .group_by(StageResult.stage)
+        .order_by(StageResult.stage)
+    )
+    stage_latency = [
+        {"stage": st, "count": c, "avg_ms": round(avg or 0, 1), "min_ms": lo, "max_ms": hi}
+        for st, c, avg, lo, hi in (await session.execute(q)).all()
+    ]
+
+    return {
+        "since": since,
+        "until": until,
+        "validations": {
+            "total": total,
+            "accepted": accepted,
+            "acceptance_rate": round(accepted / total, 4) if total else None,
+            "avg_issue_count": round(float(avg_issues), 2) if avg_issues is not None else None,
+        },
+        "by_status": by_status,
+        "by_model": by_model,
+        "top_discrepancy_fields": top_fields,
+        # computed stages only; reused stages cost nothing
+        "stage_latency_ms": stage_latency,
+    }
@@ -1,25 +1,97 @@
 # app/services/agent_services.py
 import os
 import json
-from crewai import Agent, Task, Crew, LLM
+import functools
 from app.services.pdf_reader import read_pdf_text
 from app.services.ucp_loader import load_ucp_db_from_dir
+from app.metrics import span, timed
+from app.warmup import ensure
+from app.services.extraction_schemas import LCExtraction, DOCUMENT_SCHEMAS, document_schema, fields_prompt
+from app.services.llm_gateway import gateway, kickoff, messages_text
 from typing import List, Dict, Any
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL", "groq/meta-llama/llama-guard-4-12b")
+# OpenAI-compatible endpoint override, e.g. a local stub for benchmarks
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+# ask the provider for JSON-mode output on extraction calls
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1") == "1"
 
+
+def _crewai():
+    # crewai is imported on first use (or by the warm-up thread), not at startup
+    ensure("crewai")
+    from crewai import Agent, Task, Crew
+    return Agent, Task, Crew
+
+
+@functools.lru_cache(maxsize=None)
+def _gated_llm_class():
+    ensure("crewai")
+    from crewai import LLM
+
+    class GatedLLM(LLM):
+        """
+        Every completion an agent asks for (tool loops and retries of a
+        malformed answer included) is admitted by the LLM gateway.
+        """
+
+        def call(self, messages, *args, **kwargs):
+            parent = super().call
+            return gateway.call(lambda: parent(messages, *args, **kwargs), prompt=messages_text(messages))
+
+    return GatedLLM
+
+
+def make_llm(**kwargs):
+    return _gated_llm_class()(model=LLM_MODEL, api_key=GROQ_API_KEY, base_url=LLM_BASE_URL, **kwargs)
+
+
+def _parses(text: str) -> bool:
+    try:
+        json.loads(text.strip())
+    except Exception:
+        return False
+    return True
+
+
+def _valid_extraction(schema_for):
+    """
+    Cache check for extraction answers: a JSON object that passes its schema.
+    Anything else goes through repair / re-prompt and is asked for again.
+    """
+    def accept(text: str) -> bool:
+        try:
+            data = json.loads(text.strip())
+            if not isinstance(data, dict):
+                return False
+            schema_for(data).model_validate(data)
+        except Exception:
+            return False
+        return True
+    return accept
+
+
+def _extraction_llm():
+    kwargs = {"response_format": {"type": "json_object"}} if LLM_JSON_MODE else {}
+    return make_llm(temperature=0.1, **kwargs)
+
+@timed("agent", agent="lc_extractor")
 def run_lc_extractor(lc_text: str):
+    Agent, Task, Crew = _crewai()
     extractor = Agent(
         role="LC Extractor",
         goal="Extract key fields from a Letter of Credit (LC) document",
         backstory="You are an expert in trade finance documents and extract only structured fields.",
-        llm=LLM(model="groq/meta-llama/llama-guard-4-12b", temperature=0.1, api_key=GROQ_API_KEY),
+        llm=_extraction_llm(),
         allow_delegation=False,
         verbose=False,
     )
     task = Task(
         description=f"""
 Extract the most important fields from the following Letter of Credit (LC) document and return ONLY a valid JSON object.
+Use these keys (null when absent; add other relevant fields as extra keys):
+{fields_prompt(LCExtraction)}
 
 Document:
 {lc_text}
@@ -28,39 +100,90 @@ Document:
         agent=extractor,
     )
     crew = Crew(agents=[extractor], tasks=[task], verbose=False)
-    result = crew.kickoff()
+    result = kickoff(crew, task.description, accept=_valid_extraction(lambda data: LCExtraction))
     try:
         return json.loads(str(result).strip())
     except Exception:
         return {"raw_output": str(result)}
 
+@timed("agent", agent="doc_extractor")
 def run_doc_extractor(doc_text: str):
+    Agent, Task, Crew = _crewai()
     extractor = Agent(
         role="Document Extractor",
         goal="Extract key structured fields from PDF documents",
         backstory="You are an expert in trade finance and logistics documents.",
-        llm=LLM(model="groq/meta-llama/llama-guard-4-12b", temperature=0.1, api_key=GROQ_API_KEY),
+        llm=_extraction_llm(),
         allow_delegation=False,
         verbose=False,
     )
+    schemas = "\n\n".join(
+        f'document_type "{name}":\n{fields_prompt(schema)}' for name, schema in DOCUMENT_SCHEMAS.items()
+    )
     task = Task(
-        description=f"Extract fields from the following document. Return only a valid JSON object.\n\n{doc_text}",
+        description=f"""
+Extract fields from the following document. Return only a valid JSON object.
+Set "document_type" to one of: {", ".join(DOCUMENT_SCHEMAS)}, then use the keys listed for that type
+(null when absent; add other relevant fields as extra keys):
+
+{schemas}
+
+Document:
+{doc_text}
+""",
         expected_output="Valid JSON object with extracted fields.",
         agent=extractor,
     )
     crew = Crew(agents=[extractor], tasks=[task], verbose=False)
-    result = crew.kickoff()
+    result = kickoff(crew, task.description,
+                     accept=_valid_extraction(lambda data: document_schema(data.get("document_type"))))
+    try:
+        return json.loads(str(result).strip())
+    except Exception:
+        return {"raw_output": str(result)}
+
+@timed("agent", agent="field_repair")
+def run_field_repair(fields_spec: str, invalid: Dict[str, Any], source_text: str):
+    """
+    Targeted re-prompt: ask again only for the fields that failed validation.
+    """
+    Agent, Task, Crew = _crewai()
+    fixer = Agent(
+        role="Field Corrector",
+        goal="Re-extract specific fields from a trade finance document in the required format",
+        backstory="You are an expert in trade finance documents and return only structured fields.",
+        llm=_extraction_llm(),
+        allow_delegation=False,
+        verbose=False,
+    )
+    task = Task(
+        description=f"""
+These fields were extracted with the wrong format: {json.dumps(invalid, default=str)}
+Re-extract ONLY these fields from the document and return ONLY a JSON object with them:
+{fields_spec}
+
+Document:
+{source_text}
+""",
+        expected_output="Valid JSON object with the requested fields only.",
+        agent=fixer,
+    )
+    crew = Crew(agents=[fixer], tasks=[task], verbose=False)
+    # a re-prompt exists because the last answer was wrong; always ask the model
+    result = kickoff(crew, task.description, use_cache=False)
     try:
         return json.loads(str(result).strip())
     except Exception:
         return {"raw_output": str(result)}
 
+@timed("agent", agent="discrepancy_check")
 def run_discrepancy_check(lc_data: Dict[str, Any], doc_results: List[Dict[str, Any]]):
+    Agent, Task, Crew = _crewai()
     checker = Agent(
         role="Discrepancy Checker",
         goal="Compare LC document with supporting documents and flag matches, mismatches, or interchanges.",
         backstory="You are an expert trade finance compliance officer.",
-        llm=LLM(model="groq/meta-llama/llama-guard-4-12b", temperature=0.1, api_key=GROQ_API_KEY),
+        llm=make_llm(temperature=0.1),
         allow_delegation=False,
         verbose=False,
     )
@@ -73,11 +196,12 @@ LC Data: {json.dumps(lc_data)}
 Document Data: {json.dumps(doc.get('data', {}))}
 
 Return a JSON array rows:
-[{{"Field":"...","LC Value":"...","Document Value":"...","Status":"..."}}, ...]
+[{{"Field":"...","LC Value":"...","Document Value":"...","Status":"Match" | "Mismatch" | "Missing"}}, ...]
+Status must be exactly one of those three words; use "Missing" when either value is absent.
 """
         task = Task(description=comparison_instructions, expected_output="JSON array", agent=checker)
         crew = Crew(agents=[checker], tasks=[task], verbose=False)
-        result = crew.kickoff()
+        result = kickoff(crew, comparison_instructions, accept=_parses)
         try:
             rows = json.loads(str(result).strip())
         except Exception:
@@ -95,18 +219,21 @@ Return a JSON array rows:
         tables.append({"file": doc.get("file_name", "Document"), "table": rows})
     return tables
 
+@timed("agent", agent="compliance_check")
 def run_compliance_check(lc_data: Dict, discrepancy_tables: List, ucp_persist_dir: str, lc_file_path: str, supporting_file_paths: List[str]):
+    Agent, Task, Crew = _crewai()
     # load ucp vector db if present
     ucp_context = ""
     try:
         if ucp_persist_dir and os.path.exists(ucp_persist_dir):
             ucp_db = load_ucp_db_from_dir(ucp_persist_dir)
-            retrieved = ucp_db.similarity_search(json.dumps(lc_data), k=3)
+            with span("similarity_search", caller="compliance"):
+                retrieved = ucp_db.similarity_search(json.dumps(lc_data), k=3)
             ucp_context = "\n\n".join([doc.page_content for doc in retrieved])
     except Exception:
         ucp_context = ""
 
-    llm_obj = LLM(model="groq/meta-llama/llama-guard-4-12b", temperature=0.1, api_key=GROQ_API_KEY)
+    llm_obj = make_llm(temperature=0.1)
 
     compliance_agent = Agent(
         role="Compliance Officer",
@@ -132,7 +259,7 @@ Return a JSON object with:
 """
     task = Task(description=task_text, expected_output="JSON object", agent=compliance_agent)
     crew = Crew(agents=[compliance_agent], tasks=[task], verbose=False)
-    result = crew.kickoff()
+    result = kickoff(crew, task_text, accept=_parses)
     try:
         parsed = json.loads(str(result).strip())
     except Exception:
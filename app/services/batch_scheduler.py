@@ -0,0 +1,415 @@
+# app/services/batch_scheduler.py
+"""
+Fair-share scheduler for bulk LC processing.
+
+Every LC in a batch becomes one job running the full pipeline
+(parse -> extract LC -> extract supporting docs -> discrepancy -> compliance).
+Jobs and the global LLM / CPU slots are handed out round-robin, first across
+users and then across each user's batches, so one large month-end upload
+cannot starve a smaller batch submitted later.
+
+Jobs, the fair queue and the LLM / CPU slots live in the worker process
+that accepted the upload, so with several gunicorn workers the caps apply
+per worker (BATCH_LLM_CONCURRENCY x workers in total). Provider traffic is
+bounded by the LLM gateway instead, which gives each worker an equal share
+of LLM_RPM / LLM_TPM. Batch and item state is written
+to the database (LCBatch / LCBatchItem) as jobs progress, so GET /batch/...
+answers the same on every worker. Items still queued when their worker
+stops stay "queued".
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+from datetime import datetime
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlmodel import select
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.database import AsyncSessionLocal
+from app.models import LC, LCBatch, LCBatchItem
+from app.services.pdf_reader import read_pdf_text
+from app.services.llm_gateway import gateway, llm_priority
+from app.services.incremental import revalidate
+from app.services.lc_pipeline import is_main_lc, record_validation
+from app.services.structured_extraction import extract_lc
+
+# per worker process, like the slot limits below
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_CPU_CONCURRENCY = int(os.getenv("BATCH_CPU_CONCURRENCY", str(os.cpu_count() or 2)))
+# finished batches kept in memory for the local stats; status queries read the database
+BATCH_HISTORY = int(os.getenv("BATCH_HISTORY", "200"))
+
+
+def _eta(remaining: int, throughput: float) -> Optional[float]:
+    if not remaining:
+        return 0.0
+    if not throughput:
+        return None
+    return round(remaining / throughput, 1)
+
+
+class FairQueue:
+    """
+    Two-level round-robin queue: user -> batch -> FIFO of items.
+    """
+
+    def __init__(self):
+        self._users: "OrderedDict[str, OrderedDict[str, deque]]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, user: str, batch_id: str, item):
+        batches = self._users.setdefault(user, OrderedDict())
+        batches.setdefault(batch_id, deque()).append(item)
+        self._size += 1
+
+    def pop(self):
+        user, batches = next(iter(self._users.items()))
+        batch_id, items = next(iter(batches.items()))
+        item = items.popleft()
+        self._size -= 1
+        # rotate both levels so the next pop serves someone else
+        if items:
+            batches.move_to_end(batch_id)
+        else:
+            del batches[batch_id]
+        if batches:
+            self._users.move_to_end(user)
+        else:
+            del self._users[user]
+        return item
+
+
+class FairLimiter:
+    """
+    Counting semaphore whose waiters are woken in FairQueue order instead of
+    arrival order.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._free = slots
+        self._waiters = FairQueue()
+
+    @property
+    def in_use(self) -> int:
+        return self.slots - self._free
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, user: str, batch_id: str):
+        if self._free > 0 and not len(self._waiters):
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.push(user, batch_id, fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # slot was granted as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while len(self._waiters):
+            fut = self._waiters.pop()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+    async def run(self, user: str, batch_id: str, fn: Callable, *args):
+        """
+        Run a blocking callable in a worker thread while holding one slot.
+        """
+        await self.acquire(user, batch_id)
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self.release()
+
+
+@dataclass
+class BatchItem:
+    lc_no: str
+    lc_id: int
+    row_id: Optional[int] = None  # LCBatchItem.id
+    status: str = "queued"  # queued | running | done | failed
+    stage: Optional[str] = None
+    overall_status: Optional[str] = None
+    error: Optional[str] = None
+    seconds: Optional[float] = None
+
+
+@dataclass
+class Batch:
+    id: str
+    user: str
+    ucp_id: Optional[int]
+    items: List[BatchItem]
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def counts(self) -> Dict[str, int]:
+        out = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for it in self.items:
+            out[it.status] += 1
+        return out
+
+    def progress(self) -> Dict[str, Any]:
+        counts = self.counts()
+        finished = counts["done"] + counts["failed"]
+        remaining = len(self.items) - finished
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        throughput = finished / elapsed if elapsed > 0 else 0.0
+        return {
+            "batch_id": self.id,
+            "user": self.user,
+            "total": len(self.items),
+            **counts,
+            "elapsed_s": round(elapsed, 1),
+            "lcs_per_min": round(throughput * 60, 2),
+            "eta_s": _eta(remaining, throughput),
+        }
+
+
+class BatchScheduler:
+
+    def __init__(self, workers: int = BATCH_WORKERS,
+                 llm_slots: int = BATCH_LLM_CONCURRENCY, cpu_slots: int = BATCH_CPU_CONCURRENCY):
+        self.workers = workers
+        self.llm = FairLimiter(llm_slots)
+        self.cpu = FairLimiter(cpu_slots)
+        self.batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._jobs = FairQueue()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = time.time()
+        self._completed = 0
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def shutdown(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------------------------
+    # Public API
+    # -------------------------
+
+    async def submit(self, user: str, lcs: List[Dict[str, Any]], ucp_id: Optional[int] = None) -> Batch:
+        """
+        lcs: [{"lc_no": ..., "lc_id": ...}] for LCs whose files are already stored.
+        """
+        self._ensure_started()
+        batch = Batch(id=uuid4().hex, user=user, ucp_id=ucp_id,
+                      items=[BatchItem(lc_no=x["lc_no"], lc_id=x["lc_id"]) for x in lcs])
+        await self._persist(batch)
+        self.batches[batch.id] = batch
+        self._prune()
+        for item in batch.items:
+            self._jobs.push(user, batch.id, (batch, item))
+        self._wakeup.set()
+        return batch
+
+    def _prune(self):
+        finished = [b.id for b in self.batches.values() if b.finished_at is not None]
+        for bid in finished[:max(0, len(finished) - BATCH_HISTORY)]:
+            del self.batches[bid]
+
+    def stats(self) -> Dict[str, Any]:
+        active = [b for b in self.batches.values() if b.finished_at is None]
+        remaining = sum(b.counts()["queued"] + b.counts()["running"] for b in active)
+        elapsed = time.time() - self._started_at
+        throughput = self._completed / elapsed if elapsed > 0 else 0.0
+        return {
+            "active_batches": len(active),
+            "queued_jobs": len(self._jobs),
+            "remaining_lcs": remaining,
+            "completed_lcs": self._completed,
+            "lcs_per_min": round(throughput * 60, 2),
+            "eta_s": _eta(remaining, throughput),
+            "llm": {"slots": self.llm.slots, "in_use": self.llm.in_use, "waiting": self.llm.waiting},
+            "cpu": {"slots": self.cpu.slots, "in_use": self.cpu.in_use, "waiting": self.cpu.waiting},
+            "llm_gateway": gateway.stats(),
+        }
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+
+    async def _persist(self, batch: Batch):
+        async with AsyncSessionLocal() as session:
+            session.add(LCBatch(id=batch.id, user=batch.user, ucp_id=batch.ucp_id, total=len(batch.items)))
+            rows = [LCBatchItem(batch_id=batch.id, lc_id=it.lc_id, lc_no=it.lc_no) for it in batch.items]
+            session.add_all(rows)
+            await session.commit()
+        for item, row in zip(batch.items, rows):
+            item.row_id = row.id
+
+    async def _save_item(self, item: BatchItem, only_running: bool = False, **values):
+        for name, value in values.items():
+            setattr(item, name, value)
+        q = update(LCBatchItem).where(LCBatchItem.id == item.row_id).values(**values)
+        if only_running:
+            q = q.where(LCBatchItem.status == "running")
+        async with AsyncSessionLocal() as session:
+            await session.execute(q)
+            await session.commit()
+
+    async def _finish_batch(self, batch: Batch):
+        batch.finished_at = time.time()
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(LCBatch).where(LCBatch.id == batch.id).values(finished_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    # -------------------------
+    # Workers
+    # -------------------------
+
+    async def _worker(self):
+        # each worker task has its own context; LLM calls made from it queue behind interactive ones
+        llm_priority.set("batch")
+        while True:
+            if not len(self._jobs):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch, item = self._jobs.pop()
+            started = time.perf_counter()
+            try:
+                await self._save_item(item, status="running")
+                overall_status = await self._run_pipeline(batch, item)
+                outcome = {"status": "done", "stage": None, "overall_status": overall_status}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                outcome = {"status": "failed", "error": str(e)[:1000]}
+            try:
+                await self._save_item(item, seconds=round(time.perf_counter() - started, 2), **outcome)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # keep the in-memory state right even if the status write failed
+                for name, value in outcome.items():
+                    setattr(item, name, value)
+            self._completed += 1
+            counts = batch.counts()
+            if not counts["queued"] and not counts["running"]:
+                await self._finish_batch(batch)
+
+    async def _run_pipeline(self, batch: Batch, item: BatchItem) -> Optional[str]:
+        user, bid = batch.user, batch.id
+        async with AsyncSessionLocal() as session:
+            q = select(LC).where(LC.id == item.lc_id).options(selectinload(LC.attachments))
+            lc = (await session.execute(q)).scalar_one()
+            main = [a for a in lc.attachments if is_main_lc(a)]
+            if not main:
+                raise ValueError("No LC PDF in batch entry")
+
+            await self._save_item(item, only_running=True, stage="extract_lc")
+            text = await self.cpu.run(user, bid, read_pdf_text, main[0].filepath)
+            lc_data = await self.llm.run(user, bid, extract_lc, text)
+            lc.extracted_json = json.dumps(lc_data)
+            lc.status = "extracted"
+            lc.touch()
+            session.add(lc)
+            await session.commit()
+
+            # supporting docs -> discrepancy -> compliance; identical documents seen before are reused
+            compliance_result, tables, _ = await revalidate(
+                session, lc, lc.attachments, batch.ucp_id,
+                cpu=functools.partial(self.cpu.run, user, bid),
+                llm=functools.partial(self.llm.run, user, bid),
+                on_stage=lambda stage: self._save_item(item, only_running=True, stage=stage),
+            )
+            record_validation(session, lc, compliance_result, tables)
+            await session.commit()
+            return lc.status
+
+
+# -------------------------
+# Status (read from the database, so any worker can answer)
+# -------------------------
+
+ITEM_FIELDS = ("lc_no", "lc_id", "status", "stage", "overall_status", "error", "seconds")
+
+
+def batch_progress(batch: LCBatch, counts: Dict[str, int]) -> Dict[str, Any]:
+    finished = counts["done"] + counts["failed"]
+    remaining = batch.total - finished
+    elapsed = ((batch.finished_at or datetime.utcnow()) - batch.created_at).total_seconds()
+    throughput = finished / elapsed if elapsed > 0 else 0.0
+    return {
+        "batch_id": batch.id,
+        "user": batch.user,
+        "total": batch.total,
+        **counts,
+        "elapsed_s": round(elapsed, 1),
+        "lcs_per_min": round(throughput * 60, 2),
+        "eta_s": _eta(remaining, throughput),
+    }
+
+
+async def _status_counts(session: AsyncSession, batch_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    out = {bid: {"queued": 0, "running": 0, "done": 0, "failed": 0} for bid in batch_ids}
+    if not batch_ids:
+        return out
+    q = (
+        select(LCBatchItem.batch_id, LCBatchItem.status, func.count())
+        .where(LCBatchItem.batch_id.in_(batch_ids))
+        .group_by(LCBatchItem.batch_id, LCBatchItem.status)
+    )
+    for bid, status, n in (await session.execute(q)).all():
+        out[bid][status] = n
+    return out
+
+
+async def load_batch(session: AsyncSession, batch_id: str) -> Optional[Dict[str, Any]]:
+    batch = await session.get(LCBatch, batch_id)
+    if not batch:
+        return None
+    counts = (await _status_counts(session, [batch_id]))[batch_id]
+    q = (
+        select(*(getattr(LCBatchItem, name) for name in ITEM_FIELDS))
+        .where(LCBatchItem.batch_id == batch_id)
+        .order_by(LCBatchItem.id)
+    )
+    items = [dict(row._mapping) for row in (await session.execute(q)).all()]
+    return {**batch_progress(batch, counts), "items": items}
+
+
+async def recent_batches(session: AsyncSession, limit: int = BATCH_HISTORY) -> List[Dict[str, Any]]:
+    q = select(LCBatch).order_by(LCBatch.created_at.desc()).limit(limit)
+    batches = (await session.execute(q)).scalars().all()
+    counts = await _status_counts(session, [b.id for b in batches])
+    return [batch_progress(b, counts[b.id]) for b in batches]
+
+
+scheduler = BatchScheduler()
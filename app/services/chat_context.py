@@ -0,0 +1,225 @@
+# app/services/chat_context.py
+"""
+Chat sessions and per-(lc_id, ucp_id) context bundles for /agent/chat.
+
+A bundle is computed once per LC version: a compact LC summary, the UCP
+articles most relevant to that LC and the issues raised by its latest
+validation. LC.version is bumped by every write to the LC or its
+attachments, so a bundle built for an older version is simply rebuilt.
+Follow-up turns reuse the bundle and only add the new question plus a
+trimmed history.
+
+Sessions are stored in the database (ChatSessionRecord) so a session_id
+works on every worker; bundles are a per-process cache.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlmodel import select
+
+from app.database import AsyncSessionLocal
+from app.metrics import counter
+from app.models import LC, ChatSessionRecord, ValidationResult
+from app.services.lc_pipeline import load_validation_payload
+
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", "256"))
+# sessions idle for longer than this are dropped
+CHAT_SESSION_TTL_S = int(os.getenv("CHAT_SESSION_TTL_S", str(24 * 3600)))
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+CHAT_UCP_ARTICLES = int(os.getenv("CHAT_UCP_ARTICLES", "5"))
+# characters kept per LC field / history message in the prompt
+SUMMARY_VALUE_CHARS = 300
+HISTORY_MESSAGE_CHARS = 600
+
+context_cache_events = counter("chat_context_cache_total", "Chat context bundle lookups by result")
+
+BundleKey = Tuple[int, Optional[int]]
+
+
+@dataclass
+class ContextBundle:
+    lc_id: int
+    ucp_id: Optional[int]
+    lc_version: int
+    lc_summary: str
+    ucp_articles: str
+    discrepancy_highlights: str
+    built_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ChatSession:
+    id: str
+    user: str
+    lc_id: Optional[int]
+    ucp_id: Optional[int]
+    history: Deque[Tuple[str, str]] = field(default_factory=lambda: deque(maxlen=CHAT_HISTORY_TURNS * 2))
+    last_used: float = field(default_factory=time.time)
+
+    def add_turn(self, question: str, answer: str):
+        self.history.append(("user", question[:HISTORY_MESSAGE_CHARS]))
+        self.history.append(("assistant", answer[:HISTORY_MESSAGE_CHARS]))
+        self.last_used = time.time()
+
+    def compact_history(self) -> str:
+        return "\n".join(f"{role}: {text}" for role, text in self.history)
+
+
+def summarize_lc(extracted_json: Optional[str]) -> str:
+    """
+    Flatten extracted LC JSON to one "field: value" line per top-level key,
+    truncating long values.
+    """
+    if not extracted_json:
+        return ""
+    try:
+        data = json.loads(extracted_json)
+    except Exception:
+        return extracted_json[:SUMMARY_VALUE_CHARS * 10]
+    if not isinstance(data, dict):
+        return str(data)[:SUMMARY_VALUE_CHARS * 10]
+    lines = []
+    for key, value in data.items():
+        text = value if isinstance(value, str) else json.dumps(value)
+        lines.append(f"{key}: {text[:SUMMARY_VALUE_CHARS]}")
+    return "\n".join(lines)
+
+
+def discrepancy_highlights(payload: dict) -> str:
+    if not payload:
+        return ""
+    lines = []
+    if payload.get("overall_status"):
+        lines.append(f"Overall status: {payload['overall_status']}")
+    for issue in payload.get("ucp compliance issues", []) or []:
+        lines.append(f"- {issue if isinstance(issue, str) else json.dumps(issue)}")
+    if payload.get("recommendation"):
+        lines.append(f"Recommendation: {payload['recommendation']}")
+    return "\n".join(lines)
+
+
+class ChatContextStore:
+
+    def __init__(self, max_bundles: int = CHAT_CONTEXT_CACHE_SIZE, session_ttl_s: int = CHAT_SESSION_TTL_S):
+        self.max_bundles = max_bundles
+        self.session_ttl_s = session_ttl_s
+        self._bundles: "OrderedDict[BundleKey, ContextBundle]" = OrderedDict()
+        # key -> [lock, coroutines holding or waiting on it]; dropped when the count hits 0
+        self._locks: dict = {}
+
+    # -------------------------
+    # Sessions
+    # -------------------------
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.session_ttl_s)
+
+    async def open_session(self, user: str, lc_id: Optional[int], ucp_id: Optional[int]) -> ChatSession:
+        s = ChatSession(id=uuid4().hex, user=user, lc_id=lc_id, ucp_id=ucp_id)
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(ChatSessionRecord).where(ChatSessionRecord.last_used < self._cutoff()))
+            session.add(ChatSessionRecord(id=s.id, user=user, lc_id=lc_id, ucp_id=ucp_id))
+            await session.commit()
+        return s
+
+    async def get_session(self, session_id: str, user: str) -> Optional[ChatSession]:
+        async with AsyncSessionLocal() as session:
+            row = await session.get(ChatSessionRecord, session_id)
+        if not row or row.user != user or row.last_used < self._cutoff():
+            return None
+        s = ChatSession(id=row.id, user=row.user, lc_id=row.lc_id, ucp_id=row.ucp_id)
+        s.history.extend(tuple(turn) for turn in json.loads(row.history))
+        return s
+
+    async def save_session(self, s: ChatSession):
+        """
+        Persist the history after a turn.
+        """
+        async with AsyncSessionLocal() as session:
+            row = await session.get(ChatSessionRecord, s.id)
+            if row is None:
+                row = ChatSessionRecord(id=s.id, user=s.user, lc_id=s.lc_id, ucp_id=s.ucp_id)
+            row.history = json.dumps(list(s.history))
+            row.last_used = datetime.utcnow()
+            session.add(row)
+            await session.commit()
+
+    # -------------------------
+    # Bundles
+    # -------------------------
+
+    def invalidate_lc(self, lc_id: int):
+        for key in [k for k in self._bundles if k[0] == lc_id]:
+            del self._bundles[key]
+
+    async def get_bundle(self, lc_id: int, ucp_id: Optional[int], search_ucp) -> Optional[ContextBundle]:
+        """
+        search_ucp(ucp_id, text, k) -> str is the (blocking) UCP retriever.
+        Returns None if the LC does not exist.
+        """
+        key = (lc_id, ucp_id)
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(select(LC.version).where(LC.id == lc_id))
+            version = res.scalar_one_or_none()
+            if version is None:
+                return None
+
+            bundle = self._bundles.get(key)
+            if bundle and bundle.lc_version == version:
+                self._bundles.move_to_end(key)
+                context_cache_events.inc(result="hit")
+                return bundle
+
+            entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    bundle = self._bundles.get(key)
+                    if bundle and bundle.lc_version == version:
+                        context_cache_events.inc(result="hit")
+                        return bundle
+                    context_cache_events.inc(result="stale" if bundle else "miss")
+                    bundle = await self._build(session, lc_id, ucp_id, search_ucp)
+                    self._store(key, bundle)
+                    return bundle
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0 and self._locks.get(key) is entry:
+                    del self._locks[key]
+
+    def _store(self, key: BundleKey, bundle: ContextBundle):
+        self._bundles[key] = bundle
+        self._bundles.move_to_end(key)
+        while len(self._bundles) > self.max_bundles:
+            self._bundles.popitem(last=False)
+
+    async def _build(self, session, lc_id: int, ucp_id: Optional[int], search_ucp) -> ContextBundle:
+        lc = (await session.execute(select(LC).where(LC.id == lc_id))).scalar_one()
+        q = (
+            select(ValidationResult)
+            .where(ValidationResult.lc_id == lc_id)
+            .order_by(ValidationResult.created_at.desc())
+            .limit(1)
+        )
+        latest = (await session.execute(q)).scalar_one_or_none()
+        summary = summarize_lc(lc.extracted_json)
+        articles = await asyncio.to_thread(search_ucp, ucp_id, summary or lc.lc_no, CHAT_UCP_ARTICLES)
+        return ContextBundle(
+            lc_id=lc_id,
+            ucp_id=ucp_id,
+            lc_version=lc.version,
+            lc_summary=summary,
+            ucp_articles=articles,
+            discrepancy_highlights=discrepancy_highlights(load_validation_payload(latest) if latest else {}),
+        )
+
+
+store = ChatContextStore()
@@ -0,0 +1,139 @@
+# app/services/extraction_schemas.py
+"""
+Pydantic schemas for extraction output: the LC itself and each supporting
+document type. They are rendered into the prompt, used to validate the
+model's JSON field by field and to ask again for only the fields that failed.
+Unknown extra fields are kept so nothing the model found is thrown away.
+"""
+from typing import Annotated, Dict, List, Optional, Type, Union
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [value]
+    return value
+
+
+StrList = Annotated[List[str], BeforeValidator(_as_list)]
+Amount = Union[float, str]
+
+
+class ExtractionSchema(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+
+class LCExtraction(ExtractionSchema):
+    lc_number: Optional[str] = None
+    form_of_credit: Optional[str] = None
+    issue_date: Optional[str] = None
+    expiry_date: Optional[str] = None
+    expiry_place: Optional[str] = None
+    applicant: Optional[str] = None
+    beneficiary: Optional[str] = None
+    issuing_bank: Optional[str] = None
+    advising_bank: Optional[str] = None
+    currency: Optional[str] = None
+    amount: Optional[Amount] = None
+    tolerance: Optional[str] = None
+    available_with_by: Optional[str] = None
+    partial_shipments: Optional[str] = None
+    transhipment: Optional[str] = None
+    port_of_loading: Optional[str] = None
+    port_of_discharge: Optional[str] = None
+    latest_shipment_date: Optional[str] = None
+    goods_description: Optional[str] = None
+    incoterms: Optional[str] = None
+    documents_required: Optional[StrList] = None
+    additional_conditions: Optional[StrList] = None
+    presentation_period: Optional[str] = None
+
+
+class SupportingDocument(ExtractionSchema):
+    document_type: str = "other"
+    document_number: Optional[str] = None
+    document_date: Optional[str] = None
+    lc_number: Optional[str] = None
+
+
+class CommercialInvoice(SupportingDocument):
+    seller: Optional[str] = None
+    buyer: Optional[str] = None
+    currency: Optional[str] = None
+    amount: Optional[Amount] = None
+    goods_description: Optional[str] = None
+    quantity: Optional[str] = None
+    unit_price: Optional[str] = None
+    incoterms: Optional[str] = None
+
+
+class BillOfLading(SupportingDocument):
+    shipper: Optional[str] = None
+    consignee: Optional[str] = None
+    notify_party: Optional[str] = None
+    carrier: Optional[str] = None
+    vessel: Optional[str] = None
+    port_of_loading: Optional[str] = None
+    port_of_discharge: Optional[str] = None
+    shipped_on_board_date: Optional[str] = None
+    goods_description: Optional[str] = None
+    freight: Optional[str] = None
+
+
+class PackingList(SupportingDocument):
+    shipper: Optional[str] = None
+    consignee: Optional[str] = None
+    packages: Optional[str] = None
+    gross_weight: Optional[str] = None
+    net_weight: Optional[str] = None
+    goods_description: Optional[str] = None
+
+
+class InsuranceCertificate(SupportingDocument):
+    insured: Optional[str] = None
+    insurer: Optional[str] = None
+    currency: Optional[str] = None
+    insured_amount: Optional[Amount] = None
+    risks_covered: Optional[StrList] = None
+    voyage: Optional[str] = None
+
+
+class CertificateOfOrigin(SupportingDocument):
+    exporter: Optional[str] = None
+    consignee: Optional[str] = None
+    country_of_origin: Optional[str] = None
+    goods_description: Optional[str] = None
+    issuing_authority: Optional[str] = None
+
+
+DOCUMENT_SCHEMAS: Dict[str, Type[SupportingDocument]] = {
+    "commercial_invoice": CommercialInvoice,
+    "bill_of_lading": BillOfLading,
+    "packing_list": PackingList,
+    "insurance_certificate": InsuranceCertificate,
+    "certificate_of_origin": CertificateOfOrigin,
+    "other": SupportingDocument,
+}
+
+
+def document_schema(document_type: Optional[str]) -> Type[SupportingDocument]:
+    if not isinstance(document_type, str):
+        document_type = "other"  # the model may return a number, list, ...
+    key = (document_type or "other").strip().lower().replace(" ", "_").replace("-", "_")
+    return DOCUMENT_SCHEMAS.get(key, SupportingDocument)
+
+
+def fields_prompt(schema: Type[BaseModel], only: Optional[List[str]] = None) -> str:
+    """
+    Compact "name: type" listing of the schema for the prompt; cheaper in
+    tokens than the full JSON schema.
+    """
+    props = schema.model_json_schema().get("properties", {})
+    lines = []
+    for name, spec in props.items():
+        if only is not None and name not in only:
+            continue
+        kinds = [s.get("type") for s in spec.get("anyOf", [spec]) if s.get("type") and s.get("type") != "null"]
+        lines.append(f'- "{name}": {" or ".join(kinds) or "string"}')
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+# app/services/incremental.py
+"""
+Incremental re-validation.
+
+The compliance pipeline is a small dependency graph:
+
+    attachment file -> extract_document -> discrepancy (per document) -+
+    LC JSON -------------------------------^                           +-> compliance
+    UCP id, model ------------------------------------------------------^
+
+(plus extract_lc: LC file -> LC JSON, used by /extract_lc)
+
+Every stage output is stored as a StageResult under a fingerprint of its
+inputs (file hash, LC JSON hash, UCP id, model and STAGE_VERSION). A re-run
+reuses each stage whose fingerprint is already stored and computes only the
+rest, so adding one supporting document costs one extraction, one
+discrepancy call and the final compliance call instead of the whole chain.
+
+A new result replaces the LC's previous one for the same stage and subject
+(the supporting document, or the LC itself), so the table holds one row per
+stage and document rather than one per input change.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.metrics import counter
+from app.models import LC, Attachment, StageResult
+from app.services.agent_services import LLM_MODEL, run_compliance_check, run_discrepancy_check
+from app.services.lc_pipeline import resolve_ucp, supporting_attachments, ucp_dir
+from app.services.llm_gateway import response_cache
+from app.services.pdf_reader import read_pdf_text
+from app.services.structured_extraction import extract_document, extract_lc
+from app.utils import file_sha256
+
+# bump when prompts or schemas change so stored stage outputs stop matching
+STAGE_VERSION = 2
+
+stages_total = counter("pipeline_stages_total", "Pipeline stages by outcome (computed, skipped)")
+
+# awaitable runner for a blocking callable: asyncio.to_thread, or a scheduler's fair limiter
+Runner = Callable[..., Awaitable[Any]]
+
+
+async def _in_thread(fn: Callable, *args):
+    return await asyncio.to_thread(fn, *args)
+
+
+def content_digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def fingerprint(stage: str, **inputs) -> str:
+    return content_digest({"stage": stage, "version": STAGE_VERSION, **inputs})
+
+
+def _reusable(output: Any) -> bool:
+    # failed parses are worth retrying next time, so they are not stored
+    return not (isinstance(output, dict) and ("error" in output or "raw_output" in output))
+
+
+class StageRunner:
+    """
+    Looks up / stores stage outputs and keeps the per-run report.
+    """
+
+    def __init__(self, session: AsyncSession, lc_id: int, force: bool = False,
+                 on_stage: Optional[Callable[[str], Any]] = None):
+        self.session = session
+        self.lc_id = lc_id
+        self.force = force
+        self.on_stage = on_stage
+        self.stages: List[Dict[str, Any]] = []
+
+    async def _lookup(self, stage: str, fp: str) -> Optional[StageResult]:
+        q = (
+            select(StageResult)
+            .where(StageResult.stage == stage, StageResult.fingerprint == fp)
+            .order_by(StageResult.id.desc())
+            .limit(1)
+        )
+        return (await self.session.execute(q)).scalars().first()
+
+    async def run(self, stage: str, subject: str, label: str, inputs: Dict[str, Any],
+                  compute: Callable[[], Awaitable[Any]]) -> Any:
+        fp = fingerprint(stage, **inputs)
+        if not self.force:
+            hit = await self._lookup(stage, fp)
+            if hit:
+                stages_total.inc(stage=stage, outcome="skipped")
+                self.stages.append({"stage": stage, "subject": label, "status": "skipped",
+                                    "duration_ms": hit.duration_ms})
+                return json.loads(hit.output)
+
+        if self.on_stage:
+            # may be async (the batch scheduler persists the stage)
+            notified = self.on_stage(stage)
+            if inspect.isawaitable(notified):
+                await notified
+        started = time.perf_counter()
+        # a forced recompute must reach the model, not the LLM response cache
+        with response_cache(not self.force):
+            output = await compute()
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        if _reusable(output):
+            await self.session.execute(
+                delete(StageResult).where(
+                    StageResult.lc_id == self.lc_id, StageResult.stage == stage, StageResult.subject == subject,
+                )
+            )
+            self.session.add(StageResult(
+                lc_id=self.lc_id, stage=stage, subject=subject, fingerprint=fp,
+                model=inputs.get("model"), output=json.dumps(output, default=str), duration_ms=duration_ms,
+            ))
+        stages_total.inc(stage=stage, outcome="computed")
+        self.stages.append({"stage": stage, "subject": label, "status": "computed", "duration_ms": duration_ms})
+        return output
+
+    def report(self) -> Dict[str, Any]:
+        skipped = [s for s in self.stages if s["status"] == "skipped"]
+        return {
+            "computed": len(self.stages) - len(skipped),
+            "skipped": len(skipped),
+            # what the skipped stages took when they were last computed
+            "saved_ms": sum(s["duration_ms"] for s in skipped),
+            "stages": self.stages,
+        }
+
+
+async def ensure_content_hash(session: AsyncSession, att: Attachment, cpu: Runner = _in_thread) -> str:
+    """
+    Attachments uploaded before hashes were recorded get theirs on first use.
+    """
+    if not att.content_hash:
+        att.content_hash = await cpu(file_sha256, att.filepath)
+        session.add(att)
+    return att.content_hash
+
+
+# -------------------------
+# Stages
+# -------------------------
+
+async def extract_lc_file(runner: StageRunner, path: str, file_hash: str, previously_extracted: bool = False,
+                          cpu: Runner = _in_thread, llm: Runner = _in_thread) -> Dict[str, Any]:
+    async def compute():
+        text = await cpu(read_pdf_text, path)
+        return await llm(extract_lc, text, previously_extracted)
+
+    return await runner.run("extract_lc", "lc", "lc", {"file": file_hash, "model": LLM_MODEL}, compute)
+
+
+async def extract_document_file(runner: StageRunner, path: str, file_hash: str, label: str,
+                                cpu: Runner = _in_thread, llm: Runner = _in_thread) -> Dict[str, Any]:
+    async def compute():
+        text = await cpu(read_pdf_text, path)
+        return await llm(extract_document, text)
+
+    return await runner.run("extract_document", file_hash, label, {"file": file_hash, "model": LLM_MODEL}, compute)
+
+
+async def extract_supporting(session: AsyncSession, runner: StageRunner, attachments: List[Attachment],
+                             cpu: Runner = _in_thread, llm: Runner = _in_thread) -> List[Tuple[Attachment, Dict[str, Any]]]:
+    out = []
+    for att in supporting_attachments(attachments):
+        file_hash = await ensure_content_hash(session, att, cpu)
+        data = await extract_document_file(runner, att.filepath, file_hash, att.filename, cpu, llm)
+        out.append((att, {"file_name": att.filename, "data": data}))
+    return out
+
+
+async def discrepancy_tables(session: AsyncSession, runner: StageRunner, lc_data: Dict[str, Any],
+                             attachments: List[Attachment], cpu: Runner = _in_thread,
+                             llm: Runner = _in_thread) -> List[Dict[str, Any]]:
+    lc_hash = content_digest(lc_data)
+    tables = []
+    for att, doc in await extract_supporting(session, runner, attachments, cpu, llm):
+        doc_tables = await runner.run(
+            "discrepancy", att.content_hash, att.filename,
+            {"lc": lc_hash, "document": content_digest(doc), "model": LLM_MODEL},
+            lambda: llm(run_discrepancy_check, lc_data, [doc]),
+        )
+        tables.extend(doc_tables)
+    return tables
+
+
+async def revalidate(
+    session: AsyncSession,
+    lc: LC,
+    attachments: List[Attachment],
+    ucp_id: Optional[int] = None,
+    force: bool = False,
+    cpu: Runner = _in_thread,
+    llm: Runner = _in_thread,
+    on_stage: Optional[Callable[[str], Any]] = None,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Supporting-document extraction -> discrepancy -> compliance for an
+    extracted LC, recomputing only stages whose inputs changed.
+    Returns (compliance_result, discrepancy tables, stage report). The
+    caller commits.
+    """
+    lc_data = json.loads(lc.extracted_json)
+    ucp = await resolve_ucp(session, ucp_id)
+    runner = StageRunner(session, lc.id, force=force, on_stage=on_stage)
+
+    tables = await discrepancy_tables(session, runner, lc_data, attachments, cpu, llm)
+    compliance_result = await runner.run(
+        "compliance", "lc", "lc",
+        {"lc": content_digest(lc_data), "tables": content_digest(tables), "ucp": ucp.id if ucp else None,
+         "model": LLM_MODEL},
+        lambda: llm(run_compliance_check, lc_data, tables, ucp_dir(ucp), None, [a.filepath for a in attachments]),
+    )
+    return compliance_result, tables, runner.report()
@@ -0,0 +1,134 @@
+# app/services/json_repair.py
+"""
+Tolerant parsing of JSON produced by the model.
+
+The decoder scans for the first JSON value and stops at its end
+(json.JSONDecoder.raw_decode), so markdown fences and chatter around the
+payload are ignored. Only if that fails are local repairs applied:
+smart quotes, Python literals, trailing commas and unterminated
+strings / brackets from a truncated response. Literals and commas are
+only rewritten outside string values.
+"""
+import json
+import re
+from typing import Any, Callable, List, Tuple
+
+_decoder = json.JSONDecoder()
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PY_LITERALS = re.compile(r"(?<!\w)(True|False|None)(?!\w)")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+def _first_value(text: str) -> Any:
+    for i, ch in enumerate(text):
+        if ch in "{[":
+            try:
+                value, _ = _decoder.raw_decode(text, i)
+                return value
+            except json.JSONDecodeError:
+                continue
+    raise JSONRepairError("no JSON value found")
+
+
+def _split_strings(text: str) -> Tuple[List[Tuple[str, bool]], bool]:
+    """
+    Split text into (segment, is_string) parts, string segments being the
+    double-quoted values with their quotes. The flag is True when the text
+    ends inside an unterminated string.
+    """
+    parts = []
+    start = 0
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                parts.append((text[start:i + 1], True))
+                start = i + 1
+            continue
+        if ch == '"':
+            parts.append((text[start:i], False))
+            start = i
+            in_string = True
+    parts.append((text[start:], in_string))
+    return parts, in_string
+
+
+def _outside_strings(text: str, fix: Callable[[str], str]) -> str:
+    parts, _ = _split_strings(text)
+    return "".join(segment if is_string else fix(segment) for segment, is_string in parts)
+
+
+def _drop_trailing_commas(segment: str) -> str:
+    return _TRAILING_COMMA.sub(r"\1", segment)
+
+
+def _fix_tokens(segment: str) -> str:
+    segment = _PY_LITERALS.sub(lambda m: {"True": "true", "False": "false", "None": "null"}[m.group(1)], segment)
+    return _drop_trailing_commas(segment)
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Append whatever closing quotes / brackets a cut-off response is missing.
+    """
+    parts, in_string = _split_strings(text)
+    stack = []
+    for segment, is_string in parts:
+        if is_string:
+            continue
+        for ch in segment:
+            if ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+            elif ch in "}]" and stack:
+                stack.pop()
+    text = text.rstrip()
+    if in_string:
+        text += '"'
+    else:
+        text = text.rstrip(",")
+    return _outside_strings(text + "".join(reversed(stack)), _drop_trailing_commas)
+
+
+def _repair(text: str) -> str:
+    text = text.translate(_SMART_QUOTES)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return text
+    body = text[start:]
+    # python-style single-quoted dicts
+    if '"' not in body and "'" in body:
+        body = body.replace("'", '"')
+    return _outside_strings(body, _fix_tokens)
+
+
+def parse_model_json(text: str) -> Tuple[Any, bool]:
+    """
+    Returns (value, repaired). Raises JSONRepairError if nothing usable
+    can be recovered.
+    """
+    if not text or not text.strip():
+        raise JSONRepairError("empty model output")
+    text = _FENCE.sub("", text)
+    try:
+        return _first_value(text), False
+    except JSONRepairError:
+        pass
+    repaired = _repair(text)
+    for candidate in (repaired, _close_truncated(repaired)):
+        try:
+            return _first_value(candidate), True
+        except JSONRepairError:
+            continue
+    raise JSONRepairError("could not repair model JSON output")
@@ -0,0 +1,181 @@
+# app/services/lc_pipeline.py
+"""
+Building blocks of the LC validation pipeline shared by the /lc endpoints
+and the bulk scheduler: attachment selection, UCP lookup and
+persistence of the final validation result (compressed JSON payload plus
+the columns and discrepancy rows that stats are computed from).
+"""
+import os
+import ast
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models import LC, Attachment, Discrepancy, UCPDocument, ValidationResult
+from app.services.agent_services import LLM_MODEL
+
+
+def is_main_lc(att: Attachment) -> bool:
+    # heuristic used throughout: the LC PDF has "lc" in its original name
+    return "lc" in att.filename.lower() and att.filepath.endswith(".pdf")
+
+
+def supporting_attachments(attachments: List[Attachment]) -> List[Attachment]:
+    return [a for a in attachments if not is_main_lc(a)]
+
+
+async def resolve_ucp(session: AsyncSession, ucp_id: Optional[int] = None) -> Optional[UCPDocument]:
+    """
+    The requested UCP, or the active one when no id is given.
+    """
+    if ucp_id:
+        q = select(UCPDocument).where(UCPDocument.id == ucp_id)
+    else:
+        q = select(UCPDocument).where(UCPDocument.active == True)
+    res = await session.execute(q)
+    return res.scalars().first()
+
+
+def ucp_dir(ucp: Optional[UCPDocument]) -> Optional[str]:
+    if not ucp:
+        return None
+    return os.path.join("storage", "ucp", str(ucp.id))
+
+
+async def resolve_ucp_dir(session: AsyncSession, ucp_id: Optional[int] = None) -> Optional[str]:
+    """
+    Persist dir of the requested UCP, or of the active one when no id is given.
+    """
+    return ucp_dir(await resolve_ucp(session, ucp_id))
+
+
+# -------------------------
+# Validation results
+# -------------------------
+
+SUMMARY_CHARS = 500
+
+
+def pack_result(result: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def unpack_result(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def issue_count(result: Dict[str, Any]) -> int:
+    issues = result.get("ucp compliance issues") or result.get("issues") or []
+    return len(issues) if isinstance(issues, list) else 1
+
+
+def validation_columns(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queryable columns + compressed payload for one compliance result.
+    """
+    status = result.get("overall_status")
+    return {
+        "overall_status": str(status)[:32] if status else None,
+        "issue_count": issue_count(result),
+        "payload": pack_result(result),
+        "summary": str(result.get("recommendation") or status or "")[:SUMMARY_CHARS],
+    }
+
+
+# the discrepancy prompt asks for exactly these; anything else is free text from the model
+DISCREPANCY_STATUSES = {"match": None, "mismatch": "mismatch", "missing": "missing"}
+_MISSING = ("missing", "absent", "not found", "not provided", "not stated")
+_NOT_A_MATCH = ("not match", "no match", "non match", "unmatch", "does not", "doesn't", "do not", "partial")
+
+
+def _discrepancy_status(status: Any) -> Optional[str]:
+    """
+    mismatch / missing / other for a row that needs attention, None for a match.
+    """
+    s = " ".join(str(status or "").lower().replace("-", " ").split())
+    word = s.strip(" .!✅❌⚠️")
+    if word in DISCREPANCY_STATUSES:
+        return DISCREPANCY_STATUSES[word]
+    if "mismatch" in s or "❌" in s:
+        return "mismatch"
+    if "⚠" in s or any(m in s for m in _MISSING):
+        return "missing"
+    # negated and partial forms contain "match" too, so they must be ruled out first
+    if any(n in s for n in _NOT_A_MATCH):
+        return "mismatch"
+    if "match" in s or "✅" in s:
+        return None
+    return "other"
+
+
+def discrepancy_rows(tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Non-matching rows of the discrepancy tables as (field, status, document).
+    """
+    rows = []
+    for table in tables or []:
+        for row in table.get("table") or []:
+            if not isinstance(row, dict) or not row.get("Field"):
+                continue
+            status = _discrepancy_status(row.get("Status"))
+            if status:
+                rows.append({"field": str(row["Field"])[:255], "status": status, "document": table.get("file")})
+    return rows
+
+
+def record_validation(session: AsyncSession, lc: LC, compliance_result: Dict[str, Any],
+                      tables: Optional[List[Dict[str, Any]]] = None, model: Optional[str] = LLM_MODEL) -> ValidationResult:
+    vr = ValidationResult(
+        lc_id=lc.id,
+        valid=(compliance_result.get("overall_status", "").lower() == "accepted"),
+        model=model,
+        **validation_columns(compliance_result),
+    )
+    session.add(vr)
+    for row in discrepancy_rows(tables):
+        session.add(Discrepancy(validation=vr, lc_id=lc.id, **row))
+    lc.status = compliance_result.get("overall_status", lc.status)
+    lc.touch()
+    session.add(lc)
+    return vr
+
+
+def parse_legacy_result(raw: str) -> Dict[str, Any]:
+    """
+    Rows written before payloads were compressed hold a Python repr rather
+    than JSON, so fall back to literal_eval.
+    """
+    for loader in (json.loads, ast.literal_eval):
+        try:
+            value = loader(raw)
+            if isinstance(value, dict):
+                return value
+        except Exception:
+            continue
+    return {}
+
+
+def load_validation_payload(vr: ValidationResult) -> Dict[str, Any]:
+    """
+    Compliance result stored on a ValidationResult.
+    """
+    if vr.payload:
+        return unpack_result(vr.payload)
+    return parse_legacy_result(vr.raw or vr.summary or "")
+
+
+def validation_view(vr: ValidationResult) -> Dict[str, Any]:
+    return {
+        "id": vr.id,
+        "lc_id": vr.lc_id,
+        "valid": vr.valid,
+        "overall_status": vr.overall_status,
+        "issue_count": vr.issue_count,
+        "model": vr.model,
+        "summary": vr.summary,
+        "created_at": vr.created_at,
+        "result": load_validation_payload(vr),
+    }
@@ -0,0 +1,444 @@
+# app/services/llm_gateway.py
+"""
+Central gateway for every LLM call.
+
+* Token buckets for requests/min and tokens/min (LLM_RPM / LLM_TPM, scaled
+  by LLM_LIMIT_HEADROOM) so throughput sits just under the provider limit
+  instead of tripping it. LLM_RPM / LLM_TPM are the limits for the whole
+  deployment: the buckets live in each worker process, so each one gets an
+  equal share (divided by LLM_WORKERS, which defaults to WEB_CONCURRENCY as
+  exported by gunicorn.conf.py). An idle worker's share is not lent to
+  the busy ones.
+* Priority classes: a waiting interactive call (chat) is admitted before
+  default (single-LC endpoints), batch and background work. Within a class
+  it is first come, first served.
+* Jittered exponential backoff on 429 / 5xx / timeouts, honouring
+  Retry-After. A 429 also empties the request bucket so every caller backs
+  off, not just the one that was rejected.
+* A circuit breaker: after LLM_CB_FAILURES consecutive 5xx / timeout
+  failures (429s and client errors do not count), calls fail fast with
+  LLMUnavailableError for LLM_CB_COOLDOWN_S, then one probe call is let
+  through.
+
+Admission is per LLM request, not per crew: agents get their LLM from
+agent_services.make_llm(), whose call() goes through gateway.call(), so a
+crew that loops over tools or retries a malformed answer is charged for
+every completion it makes. kickoff() then settles the token bucket against
+the usage the crew reports.
+
+The core is thread-based because the CrewAI calls are synchronous (run
+them via asyncio.to_thread, never on the event loop); async callers use
+acall(), which waits for admission without blocking the loop.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from app import cache
+from app.metrics import counter, gauge, histogram
+
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))  # 0 disables the token bucket
+LLM_LIMIT_HEADROOM = float(os.getenv("LLM_LIMIT_HEADROOM", "0.9"))
+# worker processes sharing LLM_RPM / LLM_TPM; each process admits its share
+LLM_WORKERS = max(1, int(os.getenv("LLM_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "1"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "30"))
+LLM_CB_FAILURES = int(os.getenv("LLM_CB_FAILURES", "5"))
+LLM_CB_COOLDOWN_S = float(os.getenv("LLM_CB_COOLDOWN_S", "30"))
+# how often an async caller re-checks admission while waiting
+LLM_ASYNC_POLL_S = float(os.getenv("LLM_ASYNC_POLL_S", "0.05"))
+# completion budget assumed when estimating a call's token cost
+LLM_EST_COMPLETION_TOKENS = int(os.getenv("LLM_EST_COMPLETION_TOKENS", "800"))
+# opt-in: identical agent prompts are answered from the shared cache for this long
+# (only answers the caller accepted are stored); 0 disables
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "0"))
+
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2, "background": 3}
+
+# set by callers (chat, batch scheduler, prefetch) and inherited by worker threads
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default="default")
+# cleared for forced recomputes, so they never read a cached answer
+llm_use_cache: ContextVar[bool] = ContextVar("llm_use_cache", default=True)
+# estimates of the calls made inside the current kickoff(), settled against the crew's usage
+_kickoff_estimates: ContextVar[Optional[list]] = ContextVar("_kickoff_estimates", default=None)
+
+queue_depth = gauge("llm_gateway_queue_depth", "Calls waiting for admission")
+bucket_level = gauge("llm_gateway_bucket_available", "Tokens available in the limiter buckets")
+circuit_state = gauge("llm_gateway_circuit_open", "1 while the circuit breaker is open")
+admission_wait = histogram("llm_gateway_wait_seconds", "Time spent waiting for admission")
+calls_total = counter("llm_gateway_calls_total", "Gateway calls by outcome")
+retries_total = counter("llm_gateway_retries_total", "Retried LLM calls by reason")
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised while the circuit is open or when retries are exhausted.
+    """
+
+
+@contextmanager
+def priority(name: str):
+    token = llm_priority.set(name)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+@contextmanager
+def response_cache(enabled: bool):
+    token = llm_use_cache.set(enabled and llm_use_cache.get())
+    try:
+        yield
+    finally:
+        llm_use_cache.reset(token)
+
+
+def estimate_tokens(prompt: str) -> int:
+    return len(prompt) // 4 + LLM_EST_COMPLETION_TOKENS
+
+
+def messages_text(messages) -> str:
+    """
+    Prompt text of a chat-style messages list (or a plain string).
+    """
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content") or "") if isinstance(m, dict) else str(m) for m in messages or [])
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        code = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+        if isinstance(code, int):
+            return code
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException) -> Optional[str]:
+    """
+    Reason string if the error is worth retrying, else None.
+    """
+    code = _status_code(exc)
+    if code == 429:
+        return "rate_limited"
+    if code is not None and code >= 500:
+        return "server_error"
+    name = type(exc).__name__.lower()
+    if "ratelimit" in name:
+        return "rate_limited"
+    if "timeout" in name or "connection" in name or "serviceunavailable" in name:
+        return "transient"
+    return None
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if not self.enabled:
+            return 0.0
+        # never ask for more than the bucket can ever hold
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.level -= min(amount, self.capacity)
+
+
+class LLMGateway:
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, headroom: float = LLM_LIMIT_HEADROOM,
+                 workers: int = LLM_WORKERS):
+        self.requests = TokenBucket(rpm * headroom / workers)
+        self.tokens = TokenBucket(tpm * headroom / workers)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    # -------------------------
+    # Admission
+    # -------------------------
+
+    def _enqueue(self, prio: str) -> tuple:
+        entry = (PRIORITIES.get(prio, PRIORITIES["default"]), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            queue_depth.inc(1, priority=prio)
+        return entry
+
+    def _dequeue(self, entry: tuple, prio: str):
+        with self._cond:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            queue_depth.inc(-1, priority=prio)
+            bucket_level.set(self.requests.level, bucket="requests")
+            bucket_level.set(self.tokens.level, bucket="tokens")
+            self._cond.notify_all()
+
+    def _try_admit(self, entry: tuple, est_tokens: int) -> float:
+        """
+        Called with the lock held: admits `entry` and returns 0, or returns
+        how long to wait before trying again.
+        """
+        self._check_circuit()
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if self._waiting[0] != entry:
+            return 1.0
+        delay = max(self.requests.wait_time(1), self.tokens.wait_time(est_tokens))
+        if delay > 0:
+            return delay
+        self._check_circuit(claim_probe=True)
+        self.requests.take(1)
+        self.tokens.take(est_tokens)
+        return 0.0
+
+    def acquire(self, est_tokens: int, prio: Optional[str] = None):
+        prio = prio or llm_priority.get()
+        started = time.monotonic()
+        entry = self._enqueue(prio)
+        try:
+            with self._cond:
+                while True:
+                    delay = self._try_admit(entry, est_tokens)
+                    if not delay:
+                        break
+                    self._cond.wait(timeout=delay)
+        finally:
+            self._dequeue(entry, prio)
+        admission_wait.observe(time.monotonic() - started, priority=prio)
+
+    async def aacquire(self, est_tokens: int, prio: Optional[str] = None):
+        """
+        acquire() for the event loop: the lock is only held for the check
+        itself, and waiting is an asyncio.sleep.
+        """
+        prio = prio or llm_priority.get()
+        started = time.monotonic()
+        entry = self._enqueue(prio)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_admit(entry, est_tokens)
+                if not delay:
+                    break
+                await asyncio.sleep(min(delay, LLM_ASYNC_POLL_S))
+        finally:
+            self._dequeue(entry, prio)
+        admission_wait.observe(time.monotonic() - started, priority=prio)
+
+    def settle(self, est_tokens: int, actual_tokens: Optional[int]):
+        """
+        Correct the token bucket once the real usage is known.
+        """
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.take(actual_tokens - est_tokens)
+            self._cond.notify_all()
+
+    # -------------------------
+    # Circuit breaker
+    # -------------------------
+
+    def _check_circuit(self, claim_probe: bool = False):
+        if not self._open_until:
+            return
+        if time.monotonic() < self._open_until:
+            raise LLMUnavailableError("LLM provider circuit open; retry later")
+        # half-open: exactly one call goes through to test the provider
+        if self._probing:
+            raise LLMUnavailableError("LLM provider circuit half-open; probe in flight")
+        if claim_probe:
+            self._probing = True
+
+    def _record(self, ok: bool, reason: Optional[str] = None):
+        with self._cond:
+            if ok or reason is None:
+                # a client error still means the provider answered
+                self._failures = 0
+                self._open_until = 0.0
+                self._probing = False
+            elif reason == "rate_limited":
+                # the provider is up, just busy: slow everyone down instead of tripping the breaker
+                self.requests.level = 0
+                self._probing = False
+            elif reason is not None:
+                self._failures += 1
+                if self._probing or self._failures >= LLM_CB_FAILURES:
+                    self._open_until = time.monotonic() + LLM_CB_COOLDOWN_S
+                    self._probing = False
+            circuit_state.set(1 if self._open_until else 0)
+            self._cond.notify_all()
+
+    # -------------------------
+    # Calls
+    # -------------------------
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(hinted, LLM_BACKOFF_MAX_S)
+        # full jitter
+        return random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** attempt))
+
+    def call(self, fn: Callable[[], Any], prompt: str = "", usage: Optional[Callable[[Any], Optional[int]]] = None,
+             prio: Optional[str] = None):
+        """
+        Run a blocking LLM call under the limiter with retries.
+        usage(result) may return the real token count to settle the bucket.
+        """
+        est = estimate_tokens(prompt)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.acquire(est, prio)
+            try:
+                result = fn()
+            except Exception as e:
+                reason = classify(e)
+                self._record(False, reason)
+                if reason is None:
+                    calls_total.inc(outcome="error")
+                    raise
+                if attempt == LLM_MAX_RETRIES:
+                    calls_total.inc(outcome="exhausted")
+                    raise LLMUnavailableError(f"LLM provider unavailable after {attempt + 1} attempts ({reason})") from e
+                retries_total.inc(reason=reason)
+                time.sleep(self._backoff(attempt, e))
+                continue
+            self._record(True)
+            actual = usage(result) if usage else None
+            pending = _kickoff_estimates.get()
+            if actual is None and pending is not None:
+                # settled by kickoff() once the crew reports its usage
+                pending.append(est)
+            else:
+                self.settle(est, actual)
+            calls_total.inc(outcome="ok")
+            return result
+
+    async def acall(self, factory: Callable[[], Any], prompt: str = "",
+                    usage: Optional[Callable[[Any], Optional[int]]] = None, prio: Optional[str] = None):
+        """
+        Async variant: factory() returns the awaitable to run (e.g. a
+        litellm.acompletion call). For a stream, usage is not known yet:
+        call settle(estimate_tokens(prompt), total) once it has finished.
+        """
+        est = estimate_tokens(prompt)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.aacquire(est, prio)
+            try:
+                result = await factory()
+            except Exception as e:
+                reason = classify(e)
+                self._record(False, reason)
+                if reason is None:
+                    calls_total.inc(outcome="error")
+                    raise
+                if attempt == LLM_MAX_RETRIES:
+                    calls_total.inc(outcome="exhausted")
+                    raise LLMUnavailableError(f"LLM provider unavailable after {attempt + 1} attempts ({reason})") from e
+                retries_total.inc(reason=reason)
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            self._record(True)
+            self.settle(est, usage(result) if usage else None)
+            calls_total.inc(outcome="ok")
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "requests_available": round(self.requests.level, 2),
+                "tokens_available": round(self.tokens.level, 1) if self.tokens.enabled else None,
+                "waiting": len(self._waiting),
+                "circuit_open": bool(self._open_until and now < self._open_until),
+                "consecutive_failures": self._failures,
+            }
+
+
+gateway = LLMGateway()
+
+
+def crew_token_usage(result) -> Optional[int]:
+    usage = getattr(result, "token_usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+def _response_cache_key(crew, prompt: str) -> str:
+    agent = crew.agents[0] if getattr(crew, "agents", None) else None
+    model = getattr(getattr(agent, "llm", None), "model", "")
+    role = getattr(agent, "role", "")
+    return hashlib.sha256(f"{model}\0{role}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def kickoff(crew, prompt: str = "", use_cache: bool = True, accept: Optional[Callable[[str], bool]] = None):
+    """
+    crew.kickoff() with its LLM calls admitted by the gateway (see
+    make_llm), then the token bucket settled against the crew's usage.
+
+    With LLM_CACHE_TTL_S set, a cached answer is returned as the plain
+    string (callers only use str(result)) unless use_cache is False or
+    the caller is inside response_cache(False). A fresh answer is stored
+    only when accept(text) says it is usable, so malformed output is
+    always asked for again.
+    """
+    key = _response_cache_key(crew, prompt) if LLM_CACHE_TTL_S > 0 and prompt else None
+    if key and use_cache and llm_use_cache.get():
+        cached = cache.get("llm_response", key)
+        if cached is not None:
+            return cached
+    estimates = []
+    token = _kickoff_estimates.set(estimates)
+    try:
+        result = crew.kickoff()
+    finally:
+        _kickoff_estimates.reset(token)
+    if estimates:
+        gateway.settle(sum(estimates), crew_token_usage(result))
+    if key and accept is not None and accept(str(result)):
+        cache.put("llm_response", key, str(result), ttl=LLM_CACHE_TTL_S)
+    return result
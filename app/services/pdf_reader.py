@@ -1,11 +1,35 @@
 # app/services/pdf_reader.py
-from langchain_community.document_loaders import PyPDFLoader
+import os
 from typing import Optional
+from app import cache
+from app.metrics import timed
+from app.warmup import ensure
 
+
+def _text_cache_key(path: str) -> Optional[str]:
+    # path + mtime + size: a replaced upload gets a new key without hashing the file
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+
+@timed("read_pdf_text")
 def read_pdf_text(path: str) -> str:
+    key = _text_cache_key(path)
+    if key:
+        text = cache.get("pdf_text", key)
+        if text is not None:
+            return text
+    ensure("pdf")
+    from langchain_community.document_loaders import PyPDFLoader
     try:
         loader = PyPDFLoader(path)
         pages = loader.load_and_split()
-        return "".join(page.page_content for page in pages)
+        text = "".join(page.page_content for page in pages)
     except Exception as e:
         return f"ERROR_READING_PDF: {e}"
+    if key:
+        cache.put("pdf_text", key, text)
+    return text
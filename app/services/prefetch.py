@@ -0,0 +1,128 @@
+# app/services/prefetch.py
+"""
+Speculative extraction right after an upload.
+
+Once an upload is committed, the PDF is parsed and run through the
+extractor in the background, at "background" LLM priority and under a
+small concurrency cap. The result is stored as a StageResult with the same
+fingerprint /extract_lc, /extract_supporting, /discrepancy and /compliance
+look up, so by the time a reviewer opens the LC those stages are skipped.
+
+Jobs are keyed by (lc_id, slot): the LC file has one slot per LC and each
+supporting document is keyed by its file name. A new upload into the same
+slot (a replaced file) cancels the job still running for the old one. Work
+already inside a thread (a PDF parse or an LLM call in flight) finishes,
+but nothing after it runs and nothing is stored.
+
+Endpoints that run the same stages call drain() first: it waits for the
+LC's in-flight jobs so their stored results are reused instead of the same
+LLM calls being made twice (or cancels them when the endpoint forces a
+recompute). The wait is bounded by PREFETCH_DRAIN_TIMEOUT_S: a background
+job can sit behind batch work in the LLM gateway indefinitely, so a job
+still running after that is cancelled and the endpoint computes the stage
+itself at its own priority.
+
+Jobs, cancellation and PREFETCH_CONCURRENCY are per worker process: a
+re-upload or endpoint call that lands on another gunicorn worker does not
+see the job, so the old job runs to completion and the stage may be
+computed twice. For the LC file the old job's result also replaces the
+stored one, so the next endpoint call extracts the new file again.
+"""
+import asyncio
+import functools
+import os
+from typing import Dict, Optional, Tuple
+
+from app.database import AsyncSessionLocal
+from app.metrics import counter
+from app.services.incremental import StageRunner, extract_document_file, extract_lc_file
+from app.services.llm_gateway import llm_priority
+
+PREFETCH_ON_UPLOAD = os.getenv("PREFETCH_ON_UPLOAD", "0") == "1"
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))  # per worker
+# how long an endpoint waits for an in-flight prefetch before cancelling it
+PREFETCH_DRAIN_TIMEOUT_S = float(os.getenv("PREFETCH_DRAIN_TIMEOUT_S", "20"))
+
+prefetch_total = counter("prefetch_jobs_total", "Upload prefetch jobs by kind and outcome")
+
+Key = Tuple[int, str]
+
+
+class Prefetcher:
+
+    def __init__(self, concurrency: int = PREFETCH_CONCURRENCY):
+        self.concurrency = concurrency
+        self._tasks: Dict[Key, asyncio.Task] = {}
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def schedule(self, lc_id: int, path: str, content_hash: str, filename: str, main_lc: bool) -> asyncio.Task:
+        key = (lc_id, "lc" if main_lc else f"doc:{filename}")
+        self.cancel(key)
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        task = asyncio.create_task(self._run(lc_id, path, content_hash, filename, main_lc))
+        self._tasks[key] = task
+        task.add_done_callback(functools.partial(self._forget, key))
+        return task
+
+    def _forget(self, key: Key, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def cancel(self, key: Key):
+        task = self._tasks.pop(key, None)
+        if task and not task.done():
+            task.cancel()
+
+    async def drain(self, lc_id: int, slot: Optional[str] = None, cancel: bool = False,
+                    timeout: float = PREFETCH_DRAIN_TIMEOUT_S):
+        """
+        Wait up to `timeout` seconds for (or with cancel=True, cancel) this
+        LC's in-flight jobs, all of them or just one slot ("lc",
+        "doc:<file name>"). Jobs still running after the timeout are
+        cancelled. Their failures are not the caller's: the caller computes
+        whatever is missing.
+        """
+        jobs = {k: t for k, t in self._tasks.items() if k[0] == lc_id and (slot is None or k[1] == slot)}
+        if not cancel and jobs:
+            _, pending = await asyncio.wait(jobs.values(), timeout=timeout)
+            if not pending:
+                return
+            prefetch_total.inc(kind="drain", outcome="timeout")
+        for key, task in jobs.items():
+            # a job scheduled for a newer upload while we waited is left alone
+            if self._tasks.get(key) is task:
+                self.cancel(key)
+
+    async def _run(self, lc_id: int, path: str, content_hash: str, filename: str, main_lc: bool):
+        kind = "lc" if main_lc else "document"
+        # inherited by the worker threads, so the LLM gateway admits these last
+        llm_priority.set("background")
+        try:
+            async with self._sem:
+                async with AsyncSessionLocal() as session:
+                    runner = StageRunner(session, lc_id)
+                    if main_lc:
+                        await extract_lc_file(runner, path, content_hash)
+                    else:
+                        await extract_document_file(runner, path, content_hash, filename)
+                    await session.commit()
+        except asyncio.CancelledError:
+            prefetch_total.inc(kind=kind, outcome="cancelled")
+            raise
+        except Exception:
+            # best effort: the endpoint computes it on demand instead
+            prefetch_total.inc(kind=kind, outcome="failed")
+            return
+        outcome = "skipped" if runner.stages and runner.stages[0]["status"] == "skipped" else "done"
+        prefetch_total.inc(kind=kind, outcome=outcome)
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,108 @@
+# app/services/structured_extraction.py
+"""
+Schema-constrained extraction on top of the extractor agents.
+
+The agent output is parsed with the tolerant parser, validated field by
+field against the schema, and only the fields that fail validation are
+re-requested, once, with a targeted prompt. Fields that are still invalid
+keep their original value so nothing the model found is lost.
+"""
+import os
+from typing import Any, Callable, Dict, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.metrics import counter
+from app.services import agent_services
+from app.services.extraction_schemas import LCExtraction, document_schema, fields_prompt
+from app.services.json_repair import JSONRepairError, parse_model_json
+
+EXTRACTION_REPROMPT = os.getenv("EXTRACTION_REPROMPT", "1") == "1"
+
+runs_total = counter("extraction_runs_total", "Extraction agent runs")
+reruns_total = counter("extraction_rerun_total", "Extractions repeated for an already extracted LC")
+parse_total = counter("extraction_parse_total", "Extraction output parse outcomes (clean, repaired, failed)")
+reprompt_total = counter("extraction_reprompt_total", "Targeted re-prompts for invalid fields")
+invalid_fields_total = counter("extraction_invalid_fields_total", "Fields still invalid after re-prompt")
+
+
+def parse_agent_result(output: Dict[str, Any]) -> Tuple[Any, bool]:
+    """
+    Agents return the parsed JSON directly or {"raw_output": "..."}.
+    Returns (value, repaired); raises JSONRepairError.
+    """
+    if not isinstance(output, dict) or "raw_output" not in output:
+        return output, False
+    return parse_model_json(output.get("raw_output", ""))
+
+
+def validate_fields(schema: Type[BaseModel], data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Returns (valid fields, invalid fields with their original values).
+    """
+    try:
+        return schema.model_validate(data).model_dump(exclude_unset=True), {}
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+    invalid = {k: data[k] for k in bad if k in data}
+    rest = {k: v for k, v in data.items() if k not in bad}
+    return schema.model_validate(rest).model_dump(exclude_unset=True), invalid
+
+
+def _raw_text(output: Any) -> str:
+    return output.get("raw_output", "") if isinstance(output, dict) else str(output)
+
+
+def _extract(kind: str, text: str, run_agent: Callable, schema_for: Callable, error_label: str) -> Dict[str, Any]:
+    runs_total.inc(kind=kind)
+    output = run_agent(text)
+    try:
+        data, repaired = parse_agent_result(output)
+    except JSONRepairError as e:
+        parse_total.inc(kind=kind, outcome="failed")
+        return {"error": error_label, "raw": _raw_text(output), "exception": str(e)}
+    if not isinstance(data, dict):
+        parse_total.inc(kind=kind, outcome="failed")
+        return {"error": error_label, "raw": _raw_text(output), "exception": "expected a JSON object"}
+    parse_total.inc(kind=kind, outcome="repaired" if repaired else "clean")
+
+    schema = schema_for(data)
+    clean, invalid = validate_fields(schema, data)
+    if invalid and EXTRACTION_REPROMPT:
+        reprompt_total.inc(kind=kind)
+        fixed = _reprompt(schema, invalid, text)
+        retry, still_invalid = validate_fields(schema, fixed)
+        clean.update(retry)
+        invalid = {k: invalid[k] for k in still_invalid}
+    if invalid:
+        invalid_fields_total.inc(len(invalid), kind=kind)
+        clean.update(invalid)
+    return clean
+
+
+def _reprompt(schema: Type[BaseModel], invalid: Dict[str, Any], text: str) -> Dict[str, Any]:
+    output = agent_services.run_field_repair(fields_prompt(schema, only=list(invalid)), invalid, text)
+    try:
+        fixed, _ = parse_agent_result(output)
+    except JSONRepairError:
+        return dict(invalid)
+    if not isinstance(fixed, dict):
+        return dict(invalid)
+    # anything the re-prompt left out keeps its first value
+    return {**invalid, **{k: v for k, v in fixed.items() if k in invalid}}
+
+
+def extract_lc(lc_text: str, previously_extracted: bool = False) -> Dict[str, Any]:
+    if previously_extracted:
+        reruns_total.inc(kind="lc")
+    return _extract(
+        "lc", lc_text, agent_services.run_lc_extractor,
+        lambda data: LCExtraction, "Failed to parse LC JSON output",
+    )
+
+
+def extract_document(doc_text: str) -> Dict[str, Any]:
+    return _extract(
+        "document", doc_text, agent_services.run_doc_extractor,
+        lambda data: document_schema(data.get("document_type")), "Failed to parse JSON",
+    )
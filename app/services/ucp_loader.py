@@ -1,23 +1,41 @@
 # app/services/ucp_loader.py
 import os
-from PyPDF2 import PdfReader
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
+from app.metrics import timed
+from app.warmup import ensure
 
 UCP_PDF_PATH = "UCP.pdf"  # default; but in our app we'll store per-upload paths
 CHROMA_DIR_BASE = "./storage/ucp"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 CHROMA_COLLECTION = "ucp600"
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
 
-def build_ucp_vector_db(uploaded_pdf_path: str, persist_dir: str):
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2",
+
+def _build_embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
         model_kwargs={"device": "cpu"},
         encode_kwargs={"normalize_embeddings": False}
     )
 
+
+def get_embeddings():
+    """
+    Shared embedding model; loaded once per process on first use or warm-up.
+    """
+    return ensure("embeddings")
+
+@timed("build_ucp_vector_db")
+def build_ucp_vector_db(uploaded_pdf_path: str, persist_dir: str):
+    ensure("pdf")
+    ensure("vectorstore")
+    from PyPDF2 import PdfReader
+    from langchain_community.vectorstores import Chroma
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    embeddings = get_embeddings()
+
     reader = PdfReader(uploaded_pdf_path)
     pages = [page.extract_text() or "" for page in reader.pages]
     ucp_text = "\n\n".join(pages)
@@ -37,12 +55,11 @@ def build_ucp_vector_db(uploaded_pdf_path: str, persist_dir: str):
     ucp_db.persist()
     return ucp_db
 
+@timed("load_ucp_db")
 def load_ucp_db_from_dir(persist_dir: str):
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": False}
-    )
     if not os.path.exists(persist_dir):
         raise FileNotFoundError("No persisted ucp chroma at " + persist_dir)
+    ensure("vectorstore")
+    from langchain_community.vectorstores import Chroma
+    embeddings = get_embeddings()
     return Chroma(persist_directory=persist_dir, embedding_function=embeddings, collection_name=CHROMA_COLLECTION)
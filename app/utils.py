@@ -0,0 +1,45 @@
+# app/utils.py
+import hashlib
+from typing import BinaryIO, Optional
+
+HASH_CHUNK = 1024 * 1024
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True if an If-None-Match header value matches `etag` (strong comparison
+    for our own tags, but tolerant of a W/ prefix added by proxies).
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def copy_and_hash(src: BinaryIO, dst: BinaryIO) -> str:
+    """
+    Copy an upload to disk and return its sha256 in the same pass.
+    """
+    digest = hashlib.sha256()
+    while True:
+        chunk = src.read(HASH_CHUNK)
+        if not chunk:
+            break
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,145 @@
+# app/warmup.py
+"""
+Lazy loading of heavy dependencies.
+
+crewai, litellm, langchain/chromadb, the PDF loaders and the embedding
+model together take seconds and hundreds of MB to import, so nothing
+imports them at module load. Code that needs one calls ensure(<name>)
+first, and /ready reports what is warm. At startup the app can warm
+everything in a background thread (WARMUP=background, the default), block
+until warm (WARMUP=blocking) or stay fully lazy (WARMUP=off).
+
+Under gunicorn with PRELOAD_MODELS=1 (see gunicorn.conf.py) the master
+process loads the read-only subsystems once before forking, so workers
+share those pages copy-on-write instead of each holding its own copy.
+"""
+import gc
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+WARMUP = os.getenv("WARMUP", "background")  # background | blocking | off
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+# loaded in the master before fork; Chroma clients hold SQLite handles and stay per worker
+PRELOAD_SUBSYSTEMS = [n for n in os.getenv("PRELOAD_SUBSYSTEMS", "crewai,pdf,vectorstore,embeddings").split(",") if n]
+
+
+def _warm_llm():
+    import litellm
+    from app import http_client
+    from app.metrics import record_llm_usage
+    # shared keep-alive pools; TLS verification is configured in app.http_client
+    litellm.client_session = http_client.get_sync_client()
+    litellm.aclient_session = http_client.get_async_client()
+    if record_llm_usage not in litellm.success_callback:
+        litellm.success_callback.append(record_llm_usage)
+    return litellm
+
+
+def _warm_crewai():
+    ensure("llm")
+    import crewai
+    return crewai
+
+
+def _warm_pdf():
+    import PyPDF2
+    from langchain_community.document_loaders import PyPDFLoader
+    return PyPDFLoader
+
+
+def _warm_vectorstore():
+    from langchain_community.vectorstores import Chroma
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return Chroma
+
+
+def _warm_embeddings():
+    from app.services.ucp_loader import _build_embeddings
+    return _build_embeddings()
+
+
+# warm-up order: cheapest / most needed first
+SUBSYSTEMS: Dict[str, Callable] = {
+    "llm": _warm_llm,
+    "crewai": _warm_crewai,
+    "pdf": _warm_pdf,
+    "vectorstore": _warm_vectorstore,
+    "embeddings": _warm_embeddings,
+}
+
+_state: Dict[str, dict] = {name: {"status": "cold"} for name in SUBSYSTEMS}
+_locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in SUBSYSTEMS}
+_results: Dict[str, object] = {}
+
+
+def ensure(name: str):
+    """
+    Load a subsystem once (thread-safe) and return what its loader returned.
+    """
+    if name in _results:
+        return _results[name]
+    with _locks[name]:
+        if name in _results:
+            return _results[name]
+        _state[name] = {"status": "warming"}
+        started = time.perf_counter()
+        try:
+            result = SUBSYSTEMS[name]()
+        except Exception as e:
+            _state[name] = {"status": "failed", "error": str(e)}
+            raise
+        _results[name] = result
+        _state[name] = {"status": "warm", "seconds": round(time.perf_counter() - started, 3)}
+        return result
+
+
+def warm_all(names: Optional[Iterable[str]] = None):
+    for name in names or SUBSYSTEMS:
+        try:
+            ensure(name)
+        except Exception:
+            # recorded in the state; the first real use will raise properly
+            pass
+
+
+def start_background_warmup(names: Optional[Iterable[str]] = None) -> threading.Thread:
+    t = threading.Thread(target=warm_all, args=(list(names or SUBSYSTEMS),), name="warmup", daemon=True)
+    t.start()
+    return t
+
+
+def status() -> Dict[str, dict]:
+    return {name: dict(s) for name, s in _state.items()}
+
+
+def is_warm(name: str) -> bool:
+    return name in _results
+
+
+def preload(names: Optional[Iterable[str]] = None):
+    """
+    Load subsystems in a process that is about to fork workers, then move
+    everything allocated so far into the GC's permanent generation so the
+    workers' collections do not write to (and un-share) those pages.
+    """
+    # tokenizers' thread pool must not be started before a fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    warm_all(names or PRELOAD_SUBSYSTEMS)
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork():
+    """
+    Per-worker reset of state that must not be shared with the parent.
+    """
+    from app import http_client
+    from app.database import engine
+    http_client.reset_after_fork()
+    # pooled DB connections belong to the parent; never use them here
+    engine.sync_engine.dispose(close=False)
+    # otherwise every worker draws the same retry jitter
+    random.seed()
@@ -0,0 +1,72 @@
+# benchmarks/bench_db_writes.py
+"""
+Concurrent-write benchmark against a local SQLite file.
+
+Runs the same insert workload through the untuned engine ("none") and the
+SQLite profile, and reports throughput plus "database is locked" failures.
+
+    python -m benchmarks.bench_db_writes --writers 32 --writes 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlmodel import SQLModel
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import build_engine
+from app.models import LC
+
+
+async def _writer(Session, n_writes: int, writer_id: int, errors: list):
+    for i in range(n_writes):
+        try:
+            async with Session() as s:
+                s.add(LC(lc_no=f"BENCH-{writer_id}-{i}", status="created"))
+                await s.commit()
+        except OperationalError as e:
+            errors.append(str(e.orig))
+
+
+async def run_profile(profile: str, writers: int, writes: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        eng = build_engine(url, profile)
+        async with eng.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        Session = sessionmaker(eng, class_=AsyncSession, expire_on_commit=False)
+
+        errors: list = []
+        start = time.perf_counter()
+        await asyncio.gather(*(_writer(Session, writes, w, errors) for w in range(writers)))
+        elapsed = time.perf_counter() - start
+        await eng.dispose()
+
+    total = writers * writes
+    return {
+        "profile": profile,
+        "writes": total,
+        "ok": total - len(errors),
+        "locked": sum("locked" in e for e in errors),
+        "seconds": round(elapsed, 3),
+        "writes_per_s": round((total - len(errors)) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--profiles", default="none,sqlite")
+    args = parser.parse_args()
+
+    for profile in args.profiles.split(","):
+        print(asyncio.run(run_profile(profile, args.writers, args.writes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_list_pagination.py
+"""
+List latency at depth: seeds N LCs into a scratch SQLite file and times the
+first page, a page in the middle and the last page of GET /lc/.
+
+    python -m benchmarks.bench_list_pagination --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp.name, 'pages.db')}"
+
+from sqlmodel import select  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import engine, init_db  # noqa: E402
+from app.models import LC  # noqa: E402
+from app.pagination import encode_cursor, keyset_page, stream_page  # noqa: E402
+
+EXTRACTED = '{"lc_number": "X", "amount": "100000.00", "beneficiary": "' + "x" * 2000 + '"}'
+
+
+async def seed(rows: int):
+    await init_db()
+    start = datetime(2020, 1, 1)
+    batch = 5000
+    async with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            await conn.execute(insert(LC), [
+                {"lc_no": f"LC-{i}", "status": "extracted", "extracted_json": EXTRACTED,
+                 "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(offset + batch, rows))
+            ])
+
+
+async def time_page(cursor, limit: int) -> float:
+    q = keyset_page(select(LC.id, LC.lc_no, LC.status, LC.created_at), LC.created_at, LC.id, cursor, limit)
+    resp = stream_page(q, limit, lambda r: dict(r._mapping), lambda r: (r.created_at, r.id))
+    t0 = time.perf_counter()
+    async for _ in resp.body_iterator:
+        pass
+    return (time.perf_counter() - t0) * 1000
+
+
+async def main(rows: int, limit: int):
+    await seed(rows)
+    start = datetime(2020, 1, 1)
+    cursors = {
+        "first": None,
+        "middle": encode_cursor(start + timedelta(seconds=rows // 2), rows // 2),
+        "last": encode_cursor(start + timedelta(seconds=limit), limit + 1),
+    }
+    for label, cursor in cursors.items():
+        samples = sorted([await time_page(cursor, limit) for _ in range(20)])
+        print(f"{label:>6} page: p50={samples[10]:.2f}ms max={samples[-1]:.2f}ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.limit))
@@ -0,0 +1,92 @@
+# benchmarks/bench_startup.py
+"""
+Startup-time benchmark.
+
+Measures, in fresh interpreters:
+  * import time and peak RSS of `app.main`
+  * time from spawning uvicorn to the first answered /auth/token request
+  * (WARMUP=background) time until every subsystem reports warm on /ready
+
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.e2e.run import REPO_ROOT, _free_port
+
+IMPORT_PROBE = (
+    "import time, resource; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+
+def measure_import(env) -> dict:
+    out = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], env=env, cwd=REPO_ROOT, text=True)
+    seconds, maxrss_kb = out.split()[-2:]
+    return {"import_s": round(float(seconds), 3), "import_peak_rss_mb": round(int(maxrss_kb) / 1024, 1)}
+
+
+def measure_serving(env, workdir: str, warmup: str) -> dict:
+    port = _free_port()
+    env = {**env, "WARMUP": warmup}
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {"warmup": warmup}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while "first_token_s" not in result:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                try:
+                    client.post("/auth/token", data={"username": "nobody", "password": "x"})
+                    result["first_token_s"] = round(time.perf_counter() - started, 3)
+                except httpx.TransportError:
+                    time.sleep(0.05)
+            if warmup != "off":
+                deadline = time.time() + 300
+                while time.time() < deadline:
+                    body = client.get("/ready").json()
+                    states = {s["status"] for s in body["subsystems"].values()}
+                    if states <= {"warm", "failed"}:
+                        result["all_warm_s"] = round(time.perf_counter() - started, 3)
+                        result["subsystems"] = body["subsystems"]
+                        break
+                    time.sleep(0.1)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup-modes", default="off,background")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            **os.environ,
+            "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'startup.db')}",
+            "STORAGE_BASE": os.path.join(workdir, "storage"),
+            "UCP_BASE": os.path.join(workdir, "storage", "ucp"),
+        }
+        for _ in range(args.runs):
+            print(json.dumps(measure_import(env)))
+            for mode in args.warmup_modes.split(","):
+                print(json.dumps(measure_serving(env, workdir, mode)))
+
+
+if __name__ == "__main__":
+    main()
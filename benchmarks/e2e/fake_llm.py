@@ -0,0 +1,127 @@
+# benchmarks/e2e/fake_llm.py
+"""
+OpenAI-compatible stub LLM for benchmarks.
+
+Answers /v1/chat/completions (plain and streaming) with canned JSON picked
+from the prompt, after a configurable latency:
+
+    FAKE_LLM_LATENCY_MS=800 FAKE_LLM_JITTER_MS=200 \\
+        uvicorn benchmarks.e2e.fake_llm:app --port 9100
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+# per streamed token
+TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "15"))
+
+LC_JSON = {
+    "lc_number": "LC-BENCH-001",
+    "issue_date": "2024-01-15",
+    "expiry_date": "2024-06-30",
+    "applicant": "Acme Imports Ltd",
+    "beneficiary": "Globex Exports Pvt Ltd",
+    "issuing_bank": "First Trade Bank",
+    "currency": "USD",
+    "amount": 125000.0,
+    "port_of_loading": "Nhava Sheva",
+    "port_of_discharge": "Rotterdam",
+    "latest_shipment_date": "2024-05-31",
+    "goods_description": "Cotton yarn, 40s count",
+    "documents_required": ["Commercial invoice", "Bill of lading", "Packing list"],
+}
+DOC_JSON = {
+    "document_type": "commercial_invoice",
+    "document_number": "INV-778",
+    "document_date": "2024-05-20",
+    "lc_number": "LC-BENCH-001",
+    "seller": "Globex Exports Pvt Ltd",
+    "buyer": "Acme Imports Ltd",
+    "currency": "USD",
+    "amount": 125000.0,
+    "goods_description": "Cotton yarn, 40s count",
+}
+DISCREPANCY_JSON = [
+    {"Field": "amount", "LC Value": "125000.0", "Document Value": "125000.0", "Status": "✅ Match"},
+    {"Field": "goods_description", "LC Value": "Cotton yarn", "Document Value": "Cotton yarn", "Status": "✅ Match"},
+]
+COMPLIANCE_JSON = {
+    "overall_status": "Accepted",
+    "ucp compliance issues": [],
+    "recommendation": "Documents comply with the credit terms.",
+}
+CHAT_ANSWER = "The LC allows shipment until 2024-05-31 from Nhava Sheva to Rotterdam."
+
+app = FastAPI(title="fake-llm")
+stats = {"requests": 0}
+
+
+def pick_answer(prompt: str) -> str:
+    if "Return a JSON object with:" in prompt and "overall_status" in prompt:
+        return json.dumps(COMPLIANCE_JSON)
+    if "Compare LC data against supporting document" in prompt:
+        return json.dumps(DISCREPANCY_JSON)
+    if "Re-extract ONLY these fields" in prompt:
+        return "{}"
+    if "Letter of Credit (LC) document" in prompt:
+        return json.dumps(LC_JSON)
+    if "Extract fields from the following document" in prompt:
+        return json.dumps(DOC_JSON)
+    return CHAT_ANSWER
+
+
+def _usage(prompt: str, answer: str) -> dict:
+    p, c = len(prompt) // 4, len(answer) // 4
+    return {"prompt_tokens": p, "completion_tokens": c, "total_tokens": p + c}
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    answer = pick_answer(prompt)
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+
+    base = {"id": f"chatcmpl-{uuid4().hex}", "created": int(time.time()), "model": body.get("model", "stub")}
+    if not body.get("stream"):
+        return {
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": answer}}],
+            "usage": _usage(prompt, answer),
+        }
+
+    async def events():
+        for word in answer.split(" "):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(TOKEN_MS / 1000)
+        done = {**base, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": _usage(prompt, answer)}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
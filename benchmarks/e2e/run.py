@@ -0,0 +1,219 @@
+# benchmarks/e2e/run.py
+"""
+End-to-end throughput benchmark for the /lc pipeline.
+
+Starts the stub LLM and the API (against a scratch SQLite DB and storage
+dir), then replays the PDFs under storage/lc through
+create -> upload LC -> upload supporting -> extract -> discrepancy -> compliance
+at each concurrency level. Reports p50/p95/p99 per step, pipelines/s and
+the API process's peak RSS.
+
+    python -m benchmarks.e2e.run --concurrency 1,4,16 --pipelines 32 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+STEPS = ["create", "upload_lc", "upload_supporting", "extract_lc", "discrepancy", "compliance"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def _proc_hwm_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def peak_rss_mb(pid: int) -> float:
+    """
+    High-water RSS of the API process plus its uvicorn workers (Linux
+    /proc; current RSS via psutil elsewhere).
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(c) for c in f.read().split()]
+        return sum(_proc_hwm_kb(p) for p in [pid, *children]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [proc, *proc.children()]) / (1024 * 1024)
+    except Exception:
+        return float("nan")
+
+
+def find_pdfs():
+    lc_files = sorted(glob.glob(os.path.join(REPO_ROOT, "storage", "lc", "*", "*.pdf")))
+    supporting = sorted(glob.glob(os.path.join(REPO_ROOT, "storage", "lc", "*", "supporting", "*.pdf")))
+    if not lc_files:
+        # any PDF will do as the "LC" when the sample set has none at top level
+        lc_files = supporting[:1]
+    return lc_files, supporting
+
+
+def start_process(args, env, cwd, port):
+    proc = subprocess.Popen(args, env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{args} exited with {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{args} did not start listening on {port}")
+
+
+async def run_pipeline(client: httpx.AsyncClient, headers, lc_pdf: str, supporting: list, n: int) -> dict:
+    timings = {}
+
+    async def step(name, coro):
+        t0 = time.perf_counter()
+        resp = await coro
+        timings[name] = time.perf_counter() - t0
+        resp.raise_for_status()
+        return resp
+
+    resp = await step("create", client.post("/lc/", json={"lc_no": f"BENCH-{n}"}, headers=headers))
+    lc_id = resp.json()["id"]
+    with open(lc_pdf, "rb") as f:
+        await step("upload_lc", client.post(
+            f"/files/lc/{lc_id}/upload_lc", headers=headers,
+            files={"file": (f"lc_{n}.pdf", f.read(), "application/pdf")}))
+    files = []
+    for i, path in enumerate(supporting):
+        with open(path, "rb") as f:
+            files.append(("files", (f"doc_{n}_{i}.pdf", f.read(), "application/pdf")))
+    await step("upload_supporting", client.post(f"/files/lc/{lc_id}/upload_supporting", headers=headers, files=files))
+    await step("extract_lc", client.post(f"/lc/{lc_id}/extract_lc", headers=headers))
+    await step("discrepancy", client.post(f"/lc/{lc_id}/discrepancy", headers=headers))
+    await step("compliance", client.post(f"/lc/{lc_id}/compliance", headers=headers))
+    timings["pipeline"] = sum(timings.values())
+    return timings
+
+
+async def run_level(base_url: str, headers, concurrency: int, pipelines: int, lc_files, supporting) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    results, errors = [], []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        async def one(n):
+            async with sem:
+                try:
+                    results.append(await run_pipeline(client, headers, lc_files[n % len(lc_files)], supporting, n))
+                except Exception as e:
+                    errors.append(repr(e))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(pipelines)))
+        wall = time.perf_counter() - t0
+
+    steps = {}
+    for name in STEPS + ["pipeline"]:
+        samples = [r[name] * 1000 for r in results if name in r]
+        steps[name] = {p: round(_percentile(samples, q), 1) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+    requests = len(results) * len(STEPS)
+    return {
+        "concurrency": concurrency,
+        "pipelines": len(results),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": round(wall, 2),
+        "pipelines_per_s": round(len(results) / wall, 3),
+        "requests_per_s": round(requests / wall, 2),
+        "steps_ms": steps,
+    }
+
+
+async def main(args):
+    lc_files, supporting = find_pdfs()
+    if not lc_files:
+        sys.exit("no PDFs found under storage/lc")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        llm_port, api_port = _free_port(), _free_port()
+        env = {
+            **os.environ,
+            "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+            "STORAGE_BASE": os.path.join(workdir, "storage"),
+            "UCP_BASE": os.path.join(workdir, "storage", "ucp"),
+            "LLM_MODEL": "openai/stub",
+            "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+            "GROQ_API_KEY": "stub",
+            "OTEL_SDK_DISABLED": "true",
+        }
+        uvicorn = [sys.executable, "-m", "uvicorn"]
+        llm = start_process(uvicorn + ["benchmarks.e2e.fake_llm:app", "--port", str(llm_port), "--log-level", "warning"],
+                            env, REPO_ROOT, llm_port)
+        api = start_process(uvicorn + ["app.main:app", "--port", str(api_port), "--log-level", "warning",
+                                       "--workers", str(args.workers)],
+                            env, workdir, api_port)
+        base_url = f"http://127.0.0.1:{api_port}"
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                await client.post("/auth/create", json={"username": "bench", "password": "bench", "role": "write"})
+                resp = await client.post("/auth/token", data={"username": "bench", "password": "bench"})
+                resp.raise_for_status()
+                headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+            report = {"llm_latency_ms": args.llm_latency_ms, "levels": []}
+            for level in [int(x) for x in args.concurrency.split(",")]:
+                result = await run_level(base_url, headers, level, args.pipelines, lc_files, supporting)
+                result["api_peak_rss_mb"] = round(peak_rss_mb(api.pid), 1)
+                report["levels"].append(result)
+                print(f"c={level:<3} pipelines/s={result['pipelines_per_s']:<7} req/s={result['requests_per_s']:<7} "
+                      f"pipeline p50/p95/p99={result['steps_ms']['pipeline']['p50']}/"
+                      f"{result['steps_ms']['pipeline']['p95']}/{result['steps_ms']['pipeline']['p99']}ms "
+                      f"errors={result['errors']} rss={result['api_peak_rss_mb']}MB")
+        finally:
+            api.terminate()
+            llm.terminate()
+            api.wait(timeout=30)
+            llm.wait(timeout=30)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--pipelines", type=int, default=16, help="pipelines per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--json", help="write the full report to this file")
+    asyncio.run(main(parser.parse_args()))
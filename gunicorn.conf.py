@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+"""
+Multi-worker deployment:
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+With PRELOAD_MODELS=1 the app and its read-only models (CrewAI, PDF
+loaders, LangChain, the embedding model) are loaded once in the master and
+shared copy-on-write by the forked workers. Pair it with CACHE_BACKEND=sqlite
+so the workers also share PDF text, LLM response and principal caches.
+"""
+import os
+
+from app.warmup import PRELOAD_MODELS
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# the LLM gateway splits LLM_RPM / LLM_TPM across this many workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+preload_app = PRELOAD_MODELS
+
+
+def on_starting(server):
+    if PRELOAD_MODELS:
+        from app.warmup import preload
+        preload()
+
+
+def post_fork(server, worker):
+    if PRELOAD_MODELS:
+        from app.warmup import after_fork
+        after_fork()
@@ -0,0 +1,60 @@
+# tests/test_auth.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("jose")
+pytest.importorskip("passlib")
+
+from fastapi import HTTPException
+
+from app.auth import get_current_admin_user, is_admin
+from app.models import User
+from app.routers.auth_router import create_user
+from app.schemas import UserCreate
+
+
+class _NoRows:
+    def scalar_one_or_none(self):
+        return None
+
+
+class _Session:
+    def __init__(self):
+        self.added = []
+
+    async def execute(self, q):
+        return _NoRows()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+def test_role_does_not_grant_admin():
+    assert not is_admin(User(username="mallory", hashed_password="x", role="admin", is_admin=False))
+    assert is_admin(User(username="root", hashed_password="x", role="read", is_admin=True))
+
+
+@pytest.mark.parametrize("role", ["admin", "Admin", " admin "])
+def test_self_registered_admin_is_403(role):
+    session = _Session()
+    payload = UserCreate(username="mallory", password="pw", role=role)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(create_user(payload, session))
+    assert exc.value.status_code == 403
+    assert session.added == []
+
+
+def test_admin_routes_reject_admin_role_without_flag():
+    user = User(username="mallory", hashed_password="x", role="admin", is_admin=False)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_current_admin_user(user))
+    assert exc.value.status_code == 403
@@ -0,0 +1,46 @@
+# tests/test_chat_context.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("sqlalchemy")
+
+from app.services import chat_context
+from app.services.chat_context import ChatContextStore
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, q):
+        return SimpleNamespace(scalar_one_or_none=lambda: 1)
+
+
+def test_concurrent_requests_build_a_bundle_once(monkeypatch):
+    monkeypatch.setattr(chat_context, "AsyncSessionLocal", _Session)
+    store = ChatContextStore()
+    builds = []
+
+    async def build(session, lc_id, ucp_id, search_ucp):
+        builds.append(lc_id)
+        await asyncio.sleep(0.02)
+        return SimpleNamespace(lc_version=1)
+
+    store._build = build
+
+    async def main():
+        first = [asyncio.create_task(store.get_bundle(1, None, None)) for _ in range(3)]
+        await asyncio.sleep(0.01)  # arrive while the first build is still running
+        later = [asyncio.create_task(store.get_bundle(1, None, None)) for _ in range(3)]
+        return await asyncio.gather(*first, *later)
+
+    bundles = asyncio.run(main())
+    assert builds == [1]
+    assert all(b is bundles[0] for b in bundles)
+    assert store._locks == {}
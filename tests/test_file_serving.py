@@ -0,0 +1,45 @@
+# tests/test_file_serving.py
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("anyio")
+
+from app.file_serving import RangeNotSatisfiable, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-199", (100, 199)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=999-999", (999, 999)),
+    ("Bytes = 0-0", (0, 0)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-10",        # other unit
+    "bytes=0-1,5-9",     # several ranges
+    "bytes=5-3",         # last < first: invalid, not unsatisfiable
+    "bytes=abc",
+    "bytes=-",
+    "bytes=1-2-3",
+    "bytes=+1-2",
+    "bytes=",
+])
+def test_ignored_ranges(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1200", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_empty_file_ignores_range():
+    assert parse_range("bytes=0-10", 0) is None
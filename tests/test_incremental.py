@@ -0,0 +1,95 @@
+# tests/test_incremental.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import SQLModel, select
+
+from app.migrations import prune_stage_results
+from app.models import LC, StageResult
+from app.services.incremental import StageRunner
+
+
+def _with_db(tmp_path, body):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'stages.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        try:
+            async with AsyncSession(engine) as session:
+                session.add_all([LC(id=1, lc_no="LC-1"), LC(id=2, lc_no="LC-2")])
+                await session.commit()
+                return await body(engine, session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _rows(session):
+    res = await session.execute(select(StageResult.lc_id, StageResult.stage, StageResult.subject, StageResult.output))
+    return sorted(res.all())
+
+
+def test_new_result_supersedes_the_previous_one(tmp_path):
+    async def body(engine, session):
+        for lc_id, tables in [(1, "a"), (1, "b"), (1, "c"), (2, "a")]:
+            runner = StageRunner(session, lc_id)
+
+            async def compute(tables=tables):
+                return {"tables": tables}
+
+            await runner.run("compliance", "lc", "lc", {"tables": tables}, compute)
+            await runner.run("discrepancy", "doc-hash", "doc.pdf", {"tables": tables}, compute)
+            await session.commit()
+        return await _rows(session)
+
+    assert _with_db(tmp_path, body) == [
+        (1, "compliance", "lc", '{"tables": "c"}'),
+        (1, "discrepancy", "doc-hash", '{"tables": "c"}'),
+        (2, "compliance", "lc", '{"tables": "a"}'),
+        (2, "discrepancy", "doc-hash", '{"tables": "a"}'),
+    ]
+
+
+def test_skipped_stage_keeps_its_row(tmp_path):
+    async def body(engine, session):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"ok": True}
+
+        for _ in range(2):
+            await StageRunner(session, 1).run("compliance", "lc", "lc", {"x": 1}, compute)
+            await session.commit()
+        count = (await session.execute(select(func.count()).select_from(StageResult))).scalar_one()
+        return len(calls), count
+
+    assert _with_db(tmp_path, body) == (1, 1)
+
+
+def test_migration_keeps_the_newest_row_per_subject(tmp_path):
+    async def body(engine, session):
+        session.add_all([
+            StageResult(lc_id=1, stage="extract_lc", subject="hash-1", fingerprint="f1", output="1"),
+            StageResult(lc_id=1, stage="extract_lc", subject="hash-2", fingerprint="f2", output="2"),
+            StageResult(lc_id=1, stage="compliance", subject="lc", fingerprint="f3", output="3"),
+            StageResult(lc_id=1, stage="compliance", subject="lc", fingerprint="f4", output="4"),
+            StageResult(lc_id=2, stage="compliance", subject="lc", fingerprint="f5", output="5"),
+        ])
+        await session.commit()
+        async with engine.begin() as conn:
+            await conn.run_sync(prune_stage_results)
+        return await _rows(session)
+
+    assert _with_db(tmp_path, body) == [
+        (1, "compliance", "lc", "4"),
+        (1, "extract_lc", "lc", "2"),
+        (2, "compliance", "lc", "5"),
+    ]
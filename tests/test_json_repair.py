@@ -0,0 +1,62 @@
+# tests/test_json_repair.py
+import pytest
+
+from app.services.json_repair import JSONRepairError, _repair, parse_model_json
+
+
+def test_clean_json_is_not_repaired():
+    assert parse_model_json('{"a": 1}') == ({"a": 1}, False)
+
+
+def test_chatter_and_fences_are_ignored():
+    text = 'Here you go:\n```json\n{"lc_no": "LC1", "amount": 10}\n```\nAnything else?'
+    assert parse_model_json(text) == ({"lc_no": "LC1", "amount": 10}, False)
+
+
+def test_python_literals_outside_strings():
+    value, repaired = parse_model_json('{"partial": True, "transhipment": False, "expiry": None,}')
+    assert repaired
+    assert value == {"partial": True, "transhipment": False, "expiry": None}
+
+
+def test_python_literals_inside_strings_are_kept():
+    value, _ = parse_model_json('{"goods": "None specified", "note": "marked as True copy", "x": None,}')
+    assert value == {"goods": "None specified", "note": "marked as True copy", "x": None}
+
+
+def test_trailing_comma_inside_string_is_kept():
+    value, _ = parse_model_json('{"terms": "a, ]", "b": [1, 2,],}')
+    assert value == {"terms": "a, ]", "b": [1, 2]}
+
+
+def test_escaped_quotes_do_not_end_strings():
+    assert _repair('{"a": "say \\"None\\"", "b": None}') == '{"a": "say \\"None\\"", "b": null}'
+
+
+def test_single_quoted_python_dict():
+    value, repaired = parse_model_json("{'lc_no': 'LC9', 'partial': None}")
+    assert repaired
+    assert value == {"lc_no": "LC9", "partial": None}
+
+
+def test_smart_quotes():
+    value, _ = parse_model_json("{“lc_no”: “LC7”}")
+    assert value == {"lc_no": "LC7"}
+
+
+def test_truncated_response_is_closed():
+    value, repaired = parse_model_json('{"lc_no": "LC1", "documents": ["invoice", "bill of lad')
+    assert repaired
+    assert value == {"lc_no": "LC1", "documents": ["invoice", "bill of lad"]}
+
+
+def test_truncated_after_comma():
+    value, repaired = parse_model_json('{"lc_no": "LC1", "amounts": [1, 2,')
+    assert repaired
+    assert value == {"lc_no": "LC1", "amounts": [1, 2]}
+
+
+@pytest.mark.parametrize("text", ["", "   ", "no json here"])
+def test_unrecoverable_raises(text):
+    with pytest.raises(JSONRepairError):
+        parse_model_json(text)
@@ -0,0 +1,79 @@
+# tests/test_lc_detail.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("jose")
+pytest.importorskip("passlib")
+
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import SQLModel
+
+from app.models import LC, Attachment, ValidationResult
+from app.routers.lc_router import get_lc_detail, lc_etag
+
+
+def _detail(tmp_path, if_none_match=None, lc_id=None):
+    """
+    Runs get_lc_detail against a fresh SQLite DB holding one LC with two
+    attachments and two validations; returns (result, statements executed).
+    """
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'detail.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            lc = LC(lc_no="LC-1", status="created", version=3)
+            session.add(lc)
+            await session.flush()
+            session.add_all([
+                Attachment(lc_id=lc.id, filename="a.pdf", filepath="/tmp/a.pdf"),
+                Attachment(lc_id=lc.id, filename="b.pdf", filepath="/tmp/b.pdf"),
+                ValidationResult(lc_id=lc.id, valid=True, summary="ok"),
+                ValidationResult(lc_id=lc.id, valid=False, summary="bad"),
+            ])
+            await session.commit()
+            target = lc_id or lc.id
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, *a: statements.append(sql))
+        try:
+            async with AsyncSession(engine) as session:
+                result = await get_lc_detail(target, Response(), if_none_match=if_none_match,
+                                             session=session, user=None)
+        finally:
+            await engine.dispose()
+        return result, [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+    return asyncio.run(main())
+
+
+def test_unchanged_poll_is_one_statement(tmp_path):
+    result, statements = _detail(tmp_path, if_none_match=lc_etag(1, 3))
+    assert result.status_code == 304
+    assert len(statements) == 1
+
+
+def test_full_detail_loads_children_eagerly(tmp_path):
+    result, statements = _detail(tmp_path)
+    assert len(statements) == 2
+    assert sorted(a.filename for a in result["attachments"]) == ["a.pdf", "b.pdf"]
+    assert sorted(v["summary"] for v in result["validations"]) == ["bad", "ok"]
+
+
+def test_stale_etag_adds_only_the_version_check(tmp_path):
+    result, statements = _detail(tmp_path, if_none_match=lc_etag(1, 2))
+    assert isinstance(result, dict)
+    assert len(statements) == 3
+
+
+def test_missing_lc_is_404(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        _detail(tmp_path, if_none_match='"x"', lc_id=999)
+    assert exc.value.status_code == 404
@@ -0,0 +1,59 @@
+# tests/test_lc_pipeline.py
+import pytest
+
+pytest.importorskip("sqlmodel")
+
+from app.services.lc_pipeline import (
+    _discrepancy_status, discrepancy_rows, issue_count, pack_result, parse_legacy_result, unpack_result,
+)
+
+
+@pytest.mark.parametrize("status", ["Match", "match", "✅ Match", "Matched", "MATCH."])
+def test_matches_are_dropped(status):
+    assert _discrepancy_status(status) is None
+
+
+@pytest.mark.parametrize("status", [
+    "Mismatch", "❌ Mismatch", "Not matched", "No match", "Does not match", "Doesn't match",
+    "Non-match", "Unmatched", "Partial match",
+])
+def test_mismatches(status):
+    assert _discrepancy_status(status) == "mismatch"
+
+
+@pytest.mark.parametrize("status", ["Missing", "⚠️ Missing", "Not found in document", "Not provided"])
+def test_missing(status):
+    assert _discrepancy_status(status) == "missing"
+
+
+@pytest.mark.parametrize("status", ["Interchanged", "", None])
+def test_other(status):
+    assert _discrepancy_status(status) == "other"
+
+
+def test_discrepancy_rows_keep_only_non_matching():
+    tables = [
+        {"file": "invoice.pdf", "table": [
+            {"Field": "amount", "Status": "Match"},
+            {"Field": "beneficiary", "Status": "Does not match"},
+            {"Field": "port", "Status": "Missing"},
+            {"Status": "Mismatch"},
+            "garbage",
+        ]},
+        {"file": "bl.pdf", "table": None},
+    ]
+    assert discrepancy_rows(tables) == [
+        {"field": "beneficiary", "status": "mismatch", "document": "invoice.pdf"},
+        {"field": "port", "status": "missing", "document": "invoice.pdf"},
+    ]
+
+
+def test_payload_round_trip():
+    result = {"overall_status": "Accepted", "ucp compliance issues": ["a", "b"]}
+    assert unpack_result(pack_result(result)) == result
+    assert issue_count(result) == 2
+
+
+def test_legacy_repr_is_parsed():
+    assert parse_legacy_result("{'overall_status': 'Rejected', 'x': None}") == {"overall_status": "Rejected", "x": None}
+    assert parse_legacy_result("not a dict") == {}
@@ -0,0 +1,215 @@
+# tests/test_llm_gateway.py
+import asyncio
+
+import pytest
+
+from app.services.llm_gateway import (
+    LLMGateway, LLMUnavailableError, TokenBucket, classify, estimate_tokens, messages_text,
+)
+
+
+def _bucket(per_minute: float, level: float = None) -> TokenBucket:
+    bucket = TokenBucket(per_minute)
+    bucket.updated = 0.0
+    if level is not None:
+        bucket.level = level
+    return bucket
+
+
+def test_bucket_starts_full():
+    bucket = _bucket(60)
+    assert bucket.level == 60
+    assert bucket.wait_time(1) == 0
+
+
+def test_bucket_wait_time_for_missing_tokens():
+    bucket = _bucket(60, level=0)  # 1 token per second
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    assert bucket.wait_time(3) == pytest.approx(3.0)
+
+
+def test_bucket_refill_is_capped_at_capacity():
+    bucket = _bucket(60, level=0)
+    bucket.refill(30.0)
+    assert bucket.level == pytest.approx(30)
+    bucket.refill(1000.0)
+    assert bucket.level == 60
+
+
+def test_bucket_never_waits_for_more_than_capacity():
+    bucket = _bucket(60, level=0)
+    # a request bigger than the bucket waits for a full bucket, not forever
+    assert bucket.wait_time(10_000) == pytest.approx(60.0)
+    bucket.level = 60
+    bucket.take(10_000)
+    assert bucket.level == 0
+
+
+def test_bucket_can_go_negative_when_settled_up():
+    bucket = _bucket(60, level=10)
+    bucket.take(50)
+    assert bucket.level == -40
+    assert bucket.wait_time(1) == pytest.approx(41.0)
+
+
+def test_disabled_bucket():
+    bucket = _bucket(0)
+    assert not bucket.enabled
+    assert bucket.wait_time(1_000_000) == 0
+    bucket.take(5)
+    assert bucket.level == 0
+
+
+class _Error(Exception):
+    def __init__(self, status_code=None):
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize("exc, reason", [
+    (_Error(429), "rate_limited"),
+    (_Error(503), "server_error"),
+    (_Error(400), None),
+    (TimeoutError(), "transient"),
+    (ValueError(), None),
+])
+def test_classify(exc, reason):
+    assert classify(exc) == reason
+
+
+def test_messages_text():
+    assert messages_text("hi") == "hi"
+    assert messages_text([{"role": "system", "content": "a"}, {"role": "user", "content": None}]) == "a\n"
+
+
+def test_limits_are_split_across_workers():
+    gw = LLMGateway(rpm=60, tpm=9000, headroom=0.9, workers=3)
+    assert gw.requests.capacity == pytest.approx(18)
+    assert gw.tokens.capacity == pytest.approx(2700)
+
+
+def test_call_retries_then_succeeds(monkeypatch):
+    monkeypatch.setattr("app.services.llm_gateway.time.sleep", lambda s: None)
+    gw = LLMGateway(rpm=6000, tpm=0, headroom=1)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _Error(503)
+        return "ok"
+
+    assert gw.call(flaky, prompt="x") == "ok"
+    assert len(attempts) == 3
+    assert gw.stats()["consecutive_failures"] == 0
+
+
+def test_client_error_is_not_retried():
+    gw = LLMGateway(rpm=6000, tpm=0, headroom=1)
+    attempts = []
+
+    def bad():
+        attempts.append(1)
+        raise _Error(400)
+
+    with pytest.raises(_Error):
+        gw.call(bad)
+    assert len(attempts) == 1
+
+
+def test_circuit_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr("app.services.llm_gateway.time.sleep", lambda s: None)
+    monkeypatch.setattr("app.services.llm_gateway.LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr("app.services.llm_gateway.LLM_CB_FAILURES", 2)
+    gw = LLMGateway(rpm=6000, tpm=0, headroom=1)
+
+    def down():
+        raise _Error(502)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            gw.call(down)
+    calls = []
+    with pytest.raises(LLMUnavailableError, match="circuit open"):
+        gw.call(lambda: calls.append(1))
+    assert not calls
+
+
+def test_acall_waits_without_blocking_the_loop():
+    # one request per second: the second call has to wait for a refill
+    gw = LLMGateway(rpm=60, tpm=0, headroom=1)
+    gw.requests.level = 1
+
+    async def answer():
+        return "ok"
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        results = await asyncio.gather(gw.acall(answer), gw.acall(answer))
+        t.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == ["ok", "ok"]
+    assert ticks > 10  # the loop kept running while the second call waited
+
+
+def test_estimate_tokens_grows_with_prompt():
+    assert estimate_tokens("x" * 400) - estimate_tokens("") == 100
+
+
+class _Crew:
+    agents = []
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def kickoff(self):
+        self.calls += 1
+        return self.answers.pop(0)
+
+
+@pytest.fixture
+def response_cache_on(monkeypatch):
+    from app import cache
+    monkeypatch.setattr("app.services.llm_gateway.LLM_CACHE_TTL_S", 60)
+    monkeypatch.setattr(cache, "backend", cache.MemoryCache())
+
+
+def test_response_cache_is_off_by_default(monkeypatch):
+    from app.services.llm_gateway import kickoff
+    monkeypatch.setattr("app.services.llm_gateway.LLM_CACHE_TTL_S", 0)
+    crew = _Crew('{"a": 1}', '{"a": 1}')
+    kickoff(crew, "p", accept=lambda text: True)
+    kickoff(crew, "p", accept=lambda text: True)
+    assert crew.calls == 2
+
+
+def test_only_accepted_answers_are_cached(response_cache_on):
+    from app.services.llm_gateway import kickoff
+    crew = _Crew("not json", '{"a": 1}', '{"a": 2}')
+    accept = lambda text: text.startswith("{")
+    assert kickoff(crew, "p", accept=accept) == "not json"
+    assert kickoff(crew, "p", accept=accept) == '{"a": 1}'
+    assert kickoff(crew, "p", accept=accept) == '{"a": 1}'
+    assert crew.calls == 2
+
+
+def test_forced_calls_skip_the_cache(response_cache_on):
+    from app.services.llm_gateway import kickoff, response_cache
+    crew = _Crew('{"a": 1}', '{"a": 2}', '{"a": 3}')
+    accept = lambda text: True
+    kickoff(crew, "p", accept=accept)
+    with response_cache(False):
+        assert kickoff(crew, "p", accept=accept) == '{"a": 2}'
+    assert kickoff(crew, "p", use_cache=False) == '{"a": 3}'
+    # the forced answer refreshed the entry
+    assert kickoff(crew, "p", accept=accept) == '{"a": 2}'
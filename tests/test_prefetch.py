@@ -0,0 +1,51 @@
+# tests/test_prefetch.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("sqlalchemy")
+
+from app.services.prefetch import Prefetcher
+
+
+def _track(p: Prefetcher, key, coro):
+    task = asyncio.create_task(coro)
+    p._tasks[key] = task
+    return task
+
+
+def test_drain_waits_for_finished_job():
+    async def main():
+        p = Prefetcher()
+        task = _track(p, (1, "lc"), asyncio.sleep(0.01))
+        await p.drain(1, "lc", timeout=1)
+        return task
+
+    task = asyncio.run(main())
+    assert task.done() and not task.cancelled()
+
+
+def test_drain_cancels_a_job_stuck_past_the_timeout():
+    async def main():
+        p = Prefetcher()
+        stuck = _track(p, (1, "lc"), asyncio.sleep(60))
+        other = _track(p, (2, "lc"), asyncio.sleep(60))
+        await asyncio.wait_for(p.drain(1, timeout=0.05), timeout=1)
+        await asyncio.sleep(0)
+        result = stuck.cancelled(), other.done(), (1, "lc") in p._tasks
+        other.cancel()
+        return result
+
+    assert asyncio.run(main()) == (True, False, False)
+
+
+def test_drain_with_cancel_does_not_wait():
+    async def main():
+        p = Prefetcher()
+        stuck = _track(p, (1, "doc:a.pdf"), asyncio.sleep(60))
+        await asyncio.wait_for(p.drain(1, cancel=True, timeout=60), timeout=1)
+        await asyncio.sleep(0)
+        return stuck.cancelled()
+
+    assert asyncio.run(main())
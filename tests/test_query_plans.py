@@ -0,0 +1,77 @@
+# tests/test_query_plans.py
+"""
+The hot lookup queries must be served by indexes. Builds a scratch SQLite
+database through the same create_all + migrations path as the app and
+checks EXPLAIN QUERY PLAN for each router query.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("aiosqlite")
+
+from sqlmodel import SQLModel, select
+from sqlalchemy import text
+
+from app.database import build_engine
+from app.migrations import run_migrations
+from app.models import LC, Attachment, Discrepancy, StageResult, UCPDocument, ValidationResult
+from app.pagination import keyset_page
+
+QUERIES = {
+    "get_lc_detail attachments": (select(Attachment).where(Attachment.lc_id == 1), "ix_attachment_lc_id"),
+    "get_lc_detail validations": (select(ValidationResult).where(ValidationResult.lc_id == 1), "ix_validationresult_lc_id"),
+    "active ucp lookup": (select(UCPDocument).where(UCPDocument.active == True), "ix_ucpdocument_active"),
+    "list_lcs ordering": (select(LC).order_by(LC.created_at.desc()), "ix_lc_created_at"),
+    "list_lcs keyset page": (
+        keyset_page(select(LC.id, LC.lc_no, LC.status, LC.created_at), LC.created_at, LC.id, None, 50),
+        "ix_lc_created_at",
+    ),
+    "list_lcs status filter": (select(LC).where(LC.status == "extracted"), "ix_lc_status"),
+    "stage result lookup": (
+        select(StageResult).where(StageResult.stage == "compliance", StageResult.fingerprint == "x"),
+        "ix_stageresult_stage_fingerprint",
+    ),
+    "stage result supersede": (
+        select(StageResult.id).where(
+            StageResult.lc_id == 1, StageResult.stage == "discrepancy", StageResult.subject == "x",
+        ),
+        "ix_stageresult_lc_id_stage_subject",
+    ),
+    "validation stats range": (
+        select(ValidationResult.overall_status).where(ValidationResult.created_at >= "2026-01-01"),
+        "ix_validationresult_created_at",
+    ),
+    "discrepancy stats range": (
+        select(Discrepancy.field).where(Discrepancy.created_at >= "2026-01-01"),
+        "ix_discrepancy_created_at",
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    async def explain():
+        path = tmp_path_factory.mktemp("plans") / "plans.db"
+        eng = build_engine(f"sqlite+aiosqlite:///{path}")
+        found = {}
+        try:
+            async with eng.begin() as conn:
+                await conn.run_sync(SQLModel.metadata.create_all)
+                await run_migrations(conn)
+                for label, (stmt, _) in QUERIES.items():
+                    sql = str(stmt.compile(eng.sync_engine, compile_kwargs={"literal_binds": True}))
+                    rows = (await conn.execute(text("EXPLAIN QUERY PLAN " + sql))).all()
+                    found[label] = " | ".join(r[-1] for r in rows)
+        finally:
+            await eng.dispose()
+        return found
+
+    return asyncio.run(explain())
+
+
+@pytest.mark.parametrize("label", list(QUERIES))
+def test_query_uses_index(plans, label):
+    index = QUERIES[label][1]
+    assert index in plans[label], f"{label}: {plans[label]}"
@@ -0,0 +1,45 @@
+# tests/test_structured_extraction.py
+import pytest
+
+pytest.importorskip("pydantic")
+
+from app.services.json_repair import JSONRepairError
+from app.services.structured_extraction import parse_agent_result
+
+
+def test_parsed_output_passes_through():
+    assert parse_agent_result({"lc_no": "LC1"}) == ({"lc_no": "LC1"}, False)
+
+
+def test_raw_output_is_repaired():
+    value, repaired = parse_agent_result({"raw_output": '{"lc_no": "LC1", "partial": None,}'})
+    assert repaired
+    assert value == {"lc_no": "LC1", "partial": None}
+
+
+def test_unparseable_raw_output_raises():
+    with pytest.raises(JSONRepairError):
+        parse_agent_result({"raw_output": "I could not find an LC in this document."})
+
+
+def test_json_array_output_is_a_parse_error_not_a_crash():
+    from app.services.structured_extraction import _extract
+
+    result = _extract("document", "text", lambda text: [{"lc_no": "LC1"}],
+                      lambda data: None, "Failed to parse JSON")
+    assert result["error"] == "Failed to parse JSON"
+    assert result["exception"] == "expected a JSON object"
+    assert result["raw"] == "[{'lc_no': 'LC1'}]"
+
+
+@pytest.mark.parametrize("document_type", [5, ["invoice"], None, "", "  "])
+def test_non_string_document_type_falls_back_to_generic_schema(document_type):
+    from app.services.extraction_schemas import SupportingDocument, document_schema
+
+    assert document_schema(document_type) is SupportingDocument
+
+
+def test_document_type_is_normalised():
+    from app.services.extraction_schemas import CommercialInvoice, document_schema
+
+    assert document_schema(" Commercial-Invoice ") is CommercialInvoice